@@ -0,0 +1,202 @@
+"""
+Analyze every video in a folder, for overnight backlogs.
+
+Run from the backend directory:
+
+    python batch_analyze.py /data/recordings --output assests/batch
+    python batch_analyze.py /data/recordings --diarization-mode fast --limit 50
+
+Each video goes through process_video_analysis in this one process, so
+Whisper and pyannote are loaded once and stay resident for the whole run.
+While one video is transcribed and diarized, ffmpeg is already extracting
+the audio of the next one on a background thread. Batch runs leave the
+editor's session alone: its transcript, edits, audio and export source are
+not replaced and no voices are enrolled in the voice library.
+
+Results are written to <output>/<relative path>.json. <output>/manifest.json
+records every processed video with its size and modification time, so a
+rerun (or a run resumed after an interruption) skips videos that already
+succeeded and have not changed. Throughput is reported in audio-hours per
+wall-hour.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import soundfile as sf
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+STAGING_DIR = os.path.join("assests", "audio", "batch")
+
+
+def find_videos(input_dir: str) -> List[str]:
+    """Video files under `input_dir`, as sorted paths relative to it"""
+    videos = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                videos.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return videos
+
+
+def load_manifest(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"videos": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: Dict):
+    # Replaced atomically so an interrupted run never leaves a truncated manifest
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_done(entry: Optional[Dict], video_path: str, output_dir: str) -> bool:
+    """Whether the manifest entry is a success for this exact file"""
+    if not entry or entry.get("status") != "success":
+        return False
+    stat = os.stat(video_path)
+    return (entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+            and os.path.exists(os.path.join(output_dir, entry["output"])))
+
+
+def output_name(relative_path: str) -> str:
+    return relative_path.replace(os.sep, "__") + ".json"
+
+
+def prefetch_audio(video_path: str, audio_path: str) -> Optional[str]:
+    """Extract a video's audio ahead of its turn; None if ffmpeg produced nothing"""
+    from services.transcribe import extract_audio_from_video
+    extract_audio_from_video(video_path, audio_path)
+    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+        return None
+    return audio_path
+
+
+def run_batch(input_dir: str, output_dir: str, diarization: Optional[Dict] = None,
+              force: bool = False, limit: int = 0) -> Dict:
+    # Imported here so --help does not load the server and its models
+    import main
+
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+
+    videos = find_videos(input_dir)
+    todo = [v for v in videos if force or not is_done(manifest["videos"].get(v), os.path.join(input_dir, v), output_dir)]
+    if limit:
+        todo = todo[:limit]
+    print(f"[Batch] {len(videos)} videos in {input_dir}, {len(videos) - len(todo)} already done, {len(todo)} to process")
+
+    totals = {"videos": 0, "failed": 0, "audio_seconds": 0.0}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") as prefetcher:
+        def prefetch(i):
+            # Two staging files: the next video is extracted while the current one's is in use
+            return prefetcher.submit(prefetch_audio, os.path.join(input_dir, todo[i]),
+                                     os.path.join(STAGING_DIR, f"prefetch_{i % 2}.wav"))
+
+        pending = prefetch(0) if todo else None
+        for i, relative_path in enumerate(todo):
+            video_path = os.path.join(input_dir, relative_path)
+            stat = os.stat(video_path)
+            video_start = time.perf_counter()
+
+            # One bad video (or a missing ffmpeg) is recorded like any other failure, not fatal to the run
+            try:
+                audio_path = pending.result()
+                error = None if audio_path else "ffmpeg could not extract any audio"
+            except Exception as e:
+                audio_path, error = None, str(e)
+            if i + 1 < len(todo):
+                pending = prefetch(i + 1)
+
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime, "output": output_name(relative_path)}
+            audio_seconds = 0.0
+            try:
+                if error:
+                    result = {"status": "failed", "error": error}
+                else:
+                    audio_seconds = sf.info(audio_path).duration
+                    result = main.process_video_analysis(video_path, diarization, extracted_audio=audio_path,
+                                                         update_session=False)
+            except Exception as e:
+                result = {"status": "failed", "error": str(e)}
+            finally:
+                staging_path = os.path.join(STAGING_DIR, f"prefetch_{i % 2}.wav")
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+
+            wall_seconds = time.perf_counter() - video_start
+            entry.update({
+                "status": result["status"],
+                "audio_seconds": round(audio_seconds, 2),
+                "wall_seconds": round(wall_seconds, 2),
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            if result["status"] == "success":
+                with open(os.path.join(output_dir, entry["output"]), "w", encoding="utf-8") as f:
+                    json.dump(result, f)
+                totals["audio_seconds"] += audio_seconds
+                speed = f"{audio_seconds / wall_seconds:.1f}x" if wall_seconds else "-"
+                print(f"[Batch] {i + 1}/{len(todo)} {relative_path}: {audio_seconds:.1f}s audio in {wall_seconds:.1f}s ({speed})")
+            else:
+                entry["error"] = result.get("error")
+                totals["failed"] += 1
+                print(f"[Batch] {i + 1}/{len(todo)} {relative_path}: failed: {entry['error']}")
+            totals["videos"] += 1
+
+            manifest["videos"][relative_path] = entry
+            save_manifest(manifest_path, manifest)
+
+    wall_seconds = time.perf_counter() - start
+    summary = {
+        "videos": totals["videos"],
+        "failed": totals["failed"],
+        "audio_hours": round(totals["audio_seconds"] / 3600, 4),
+        "wall_hours": round(wall_seconds / 3600, 4),
+        "audio_hours_per_wall_hour": round(totals["audio_seconds"] / wall_seconds, 2) if wall_seconds else None,
+    }
+    manifest["last_run"] = summary
+    save_manifest(manifest_path, manifest)
+    print(f"[Batch] {summary['videos']} videos ({summary['failed']} failed), "
+          f"{summary['audio_hours']:.2f} audio-hours in {summary['wall_hours']:.2f} wall-hours: "
+          f"{summary['audio_hours_per_wall_hour']} audio-hours per wall-hour")
+    return summary
+
+
+def main_cli(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyze every video in a folder")
+    parser.add_argument("input_dir", help="Folder to search for videos (recursively)")
+    parser.add_argument("--output", default=os.path.join("assests", "batch"), help="Where results and manifest.json go")
+    parser.add_argument("--force", action="store_true", help="Reprocess videos the manifest marks as done")
+    parser.add_argument("--limit", type=int, default=0, help="Process at most this many videos (0 = all)")
+    parser.add_argument("--diarization-mode", choices=["full", "fast"])
+    parser.add_argument("--num-speakers", type=int)
+    parser.add_argument("--min-speakers", type=int)
+    parser.add_argument("--max-speakers", type=int)
+    opts = parser.parse_args(args)
+
+    if not os.path.isdir(opts.input_dir):
+        parser.error(f"{opts.input_dir} is not a directory")
+
+    diarization = {
+        "mode": opts.diarization_mode,
+        "num_speakers": opts.num_speakers,
+        "min_speakers": opts.min_speakers,
+        "max_speakers": opts.max_speakers,
+    }
+    summary = run_batch(opts.input_dir, opts.output, diarization, force=opts.force, limit=opts.limit)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
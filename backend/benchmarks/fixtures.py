@@ -0,0 +1,95 @@
+import os
+import json
+import subprocess
+import numpy as np
+import soundfile as sf
+from typing import Dict, List, Tuple
+
+SAMPLE_RATE = 16000
+
+
+def _synthesize_syllable(rng: np.random.Generator, f0: float, duration: float, sample_rate: int) -> np.ndarray:
+    """Harmonic burst with a little pitch movement, roughly shaped like a voiced syllable"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    glide = f0 * (1.0 + rng.uniform(-0.08, 0.08) * t / max(duration, 1e-3))
+    phase = 2 * np.pi * np.cumsum(glide) / sample_rate
+    harmonics = sum(np.sin(k * phase) / k for k in range(1, 6))
+    return (harmonics * np.hanning(len(t))).astype(np.float32)
+
+
+def synthesize_conversation(duration: float, num_speakers: int, sample_rate: int = SAMPLE_RATE,
+                            seed: int = 0) -> Tuple[np.ndarray, List[Dict]]:
+    """Generate alternating speaker turns, each speaker with its own pitch and loudness"""
+    rng = np.random.default_rng(seed)
+    total_samples = int(duration * sample_rate)
+    audio = np.zeros(total_samples, dtype=np.float32)
+    voices = [
+        {"f0": 100.0 + 55.0 * i, "gain": 0.25 + 0.05 * (i % 3)}
+        for i in range(num_speakers)
+    ]
+
+    turns = []
+    cursor = 0.5
+    speaker = 0
+    while cursor < duration - 1.0:
+        turn_length = min(rng.uniform(2.0, 8.0), duration - cursor)
+        turn_end = cursor + turn_length
+        position = cursor
+        while position < turn_end:
+            syllable = rng.uniform(0.12, 0.3)
+            start = int(position * sample_rate)
+            burst = _synthesize_syllable(rng, voices[speaker]["f0"], syllable, sample_rate)
+            burst = burst[:max(0, total_samples - start)]
+            audio[start:start + len(burst)] += voices[speaker]["gain"] * burst
+            position += syllable + rng.uniform(0.03, 0.12)
+
+        turns.append({"start": round(cursor, 3), "end": round(turn_end, 3), "speaker": f"SPEAKER_{speaker:02d}"})
+        cursor = turn_end + rng.uniform(0.2, 1.0)
+        speaker = (speaker + 1 + int(rng.integers(0, max(1, num_speakers - 1)))) % num_speakers
+
+    audio += rng.normal(0, 0.002, total_samples).astype(np.float32)
+    return np.clip(audio, -1.0, 1.0), turns
+
+
+def generate_fixture(out_dir: str, duration: float = 60.0, num_speakers: int = 2,
+                     seed: int = 0, with_video: bool = True) -> Dict:
+    """
+    Write a synthetic multi-speaker recording (wav, optional mp4) plus its ground-truth turns.
+
+    Fixtures are cached by their parameters, so repeated benchmark runs reuse them.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    name = f"fixture_{int(duration)}s_{num_speakers}spk_seed{seed}"
+    audio_path = os.path.join(out_dir, f"{name}.wav")
+    video_path = os.path.join(out_dir, f"{name}.mp4")
+    turns_path = os.path.join(out_dir, f"{name}.json")
+
+    if not os.path.exists(audio_path) or not os.path.exists(turns_path):
+        audio, turns = synthesize_conversation(duration, num_speakers, seed=seed)
+        sf.write(audio_path, audio, SAMPLE_RATE)
+        with open(turns_path, "w", encoding="utf-8") as f:
+            json.dump(turns, f, indent=2)
+
+    if with_video and not os.path.exists(video_path):
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "lavfi", "-i", f"color=c=black:s=320x240:r=25:d={duration}",
+            "-i", audio_path,
+            "-c:v", "libx264", "-preset", "ultrafast",
+            "-c:a", "aac", "-shortest", video_path
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to build video fixture: {result.stderr.decode(errors='ignore')[-500:]}")
+
+    with open(turns_path, "r", encoding="utf-8") as f:
+        turns = json.load(f)
+
+    return {
+        "name": name,
+        "audio_path": audio_path,
+        "video_path": video_path if with_video else None,
+        "duration": duration,
+        "num_speakers": num_speakers,
+        "turns": turns,
+    }
@@ -0,0 +1,353 @@
+"""
+End-to-end benchmark for the analysis and editing pipeline.
+
+Run from the backend directory (config.yaml must exist):
+
+    python -m benchmarks.run_benchmarks --duration 120 --speakers 3 --models stub
+    python -m benchmarks.run_benchmarks --models real --save-baseline
+    python -m benchmarks.run_benchmarks --models both --tolerance 0.1
+
+Every stage reports wall time, real-time factor (wall time / audio seconds) and
+peak RSS. Results are compared against benchmarks/baseline.json and the run
+exits non-zero when a stage's real-time factor regresses past the tolerance.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.fixtures import generate_fixture
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "luna_bench_fixtures")
+
+ALL_STAGES = [
+    "extract_audio", "transcribe", "diarize", "diarize_fast", "transcribe_diarize_scheduled",
+    "assign_speakers", "transcript_save_json", "transcript_load_json", "transcript_save_columnar",
+    "transcript_load_columnar", "transcript_to_dict", "speaker_segmentation", "statistics", "tts_timeline", "summarize",
+]
+
+
+@dataclass
+class StageResult:
+    stage: str
+    wall_time: float
+    rtf: float
+    peak_rss_mb: float
+
+
+class RSSSampler:
+    """Samples resident memory on a background thread to find the peak during a stage"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # ru_maxrss is the lifetime peak (KiB on Linux, bytes on macOS)
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return usage if platform.system() == "Darwin" else usage * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current_rss())
+
+
+def measure(stage: str, audio_duration: float, fn: Callable, *args, **kwargs) -> Tuple[Any, StageResult]:
+    """Run one stage and record its wall time, real-time factor and peak RSS"""
+    with RSSSampler() as sampler:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        wall_time = time.perf_counter() - start
+
+    stage_result = StageResult(
+        stage=stage,
+        wall_time=round(wall_time, 4),
+        rtf=round(wall_time / audio_duration, 5),
+        peak_rss_mb=round(sampler.peak / (1024 * 1024), 1),
+    )
+    print(f"[Benchmark] {stage:<30} {wall_time:8.2f}s  RTF {stage_result.rtf:.4f}  peak RSS {stage_result.peak_rss_mb:.0f} MB")
+    return result, stage_result
+
+
+def edit_transcript_copy(transcript: Dict, edit_ratio: float) -> Dict:
+    """Return a copy of the transcript with every n-th segment's text rewritten"""
+    edited = copy.deepcopy(transcript)
+    segments = edited.get("segments", [])
+    if not segments or edit_ratio <= 0:
+        return edited
+    step = max(1, int(round(1.0 / edit_ratio)))
+    for i in range(0, len(segments), step):
+        segments[i]["text"] = segments[i]["text"].strip() + " as discussed earlier"
+    return edited
+
+
+def diarization_accuracy(reference_turns: List[Dict], diarize_df, duration: float, resolution: float = 0.05) -> float:
+    """
+    Fraction of time labelled correctly, over the time where either side hears speech.
+
+    Hypothesis speakers are mapped to reference speakers greedily by overlap, so this
+    is roughly 1 - DER for the non-overlapping turns the fixtures contain.
+    """
+    frames = int(duration / resolution) + 1
+
+    def labels(turns):
+        codes = {}
+        track = np.full(frames, -1, dtype=np.int64)
+        for turn in turns:
+            code = codes.setdefault(turn["speaker"], len(codes))
+            track[int(turn["start"] / resolution):int(turn["end"] / resolution)] = code
+        return track, len(codes)
+
+    reference, num_ref = labels(reference_turns)
+    hypothesis, num_hyp = labels(diarize_df.to_dict("records") if len(diarize_df) else [])
+    scored = (reference >= 0) | (hypothesis >= 0)
+    if not scored.any():
+        return 1.0
+
+    both = (reference >= 0) & (hypothesis >= 0)
+    overlap = np.zeros((num_hyp, num_ref), dtype=np.int64)
+    np.add.at(overlap, (hypothesis[both], reference[both]), 1)
+    mapping = np.full(num_hyp, -2, dtype=np.int64)
+    for _ in range(min(num_hyp, num_ref)):
+        hyp, ref = np.unravel_index(np.argmax(overlap), overlap.shape)
+        if overlap[hyp, ref] == 0:
+            break
+        mapping[hyp] = ref
+        overlap[hyp, :] = -1
+        overlap[:, ref] = -1
+
+    mapped = np.where(hypothesis >= 0, mapping[np.maximum(hypothesis, 0)], -1)
+    return round(float((mapped[scored] == reference[scored]).mean()), 4)
+
+
+def run_suite(models: str, duration: float, speakers: int, edit_ratio: float,
+              stages: List[str], fixture_dir: str) -> Dict:
+    """Run the selected stages once against a fixture and return the report"""
+    if models == "stub":
+        from benchmarks.stubs import install_stubs
+        install_stubs(num_speakers=speakers)
+
+    # Imported late so stubs are in place before main builds its clients
+    import main
+    from services.transcribe import extract_audio_from_video, transcribe, diarize, assign_speakers, save_to_json
+    from services.speaker_segmentation import SpeakerSegmentationService
+    from services.tts_service import VoiceCloningTTSService
+    from services.columnar_transcript import ColumnarTranscript, columnar_path, save_transcript
+    from services.summarizer import HierarchicalSummarizer
+
+    fixture = generate_fixture(fixture_dir, duration=duration, num_speakers=speakers,
+                               with_video="extract_audio" in stages)
+    audio_seconds = fixture["duration"]
+    results: List[StageResult] = []
+
+    workdir = tempfile.mkdtemp(prefix="luna_bench_")
+    assets_dir = os.path.join(workdir, "assests")
+    audio_path = os.path.join(assets_dir, "audio", "extracted_audio.wav")
+    os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+
+    def record(stage, fn, *args, **kwargs):
+        result, stage_result = measure(stage, audio_seconds, fn, *args, **kwargs)
+        results.append(stage_result)
+        return result
+
+    if "extract_audio" in stages:
+        record("extract_audio", extract_audio_from_video, fixture["video_path"], audio_path)
+    else:
+        shutil.copyfile(fixture["audio_path"], audio_path)
+
+    transcript = record("transcribe", transcribe, audio_path)
+    diarize_df, _ = record("diarize", diarize, audio_path)
+    diarization = {"full": {"accuracy": diarization_accuracy(fixture["turns"], diarize_df, audio_seconds)}}
+    if "diarize_fast" in stages:
+        fast_df, _ = record("diarize_fast", diarize, audio_path, options={"mode": "fast"})
+        diarization["fast"] = {"accuracy": diarization_accuracy(fixture["turns"], fast_df, audio_seconds)}
+    for mode, quality in diarization.items():
+        print(f"[Benchmark] diarization ({mode}) accuracy vs ground truth: {quality['accuracy']:.1%}")
+
+    if "transcribe_diarize_scheduled" in stages:
+        scheduler = main.scheduler
+        if models == "stub" and scheduler.mode == "processes":
+            # Spawned workers would load real models, not the stubs installed here
+            from services.resource_scheduler import ResourceScheduler
+            scheduler = ResourceScheduler(transcribe_threads=scheduler.allocation("transcribe").threads,
+                                          diarize_threads=scheduler.allocation("diarize").threads)
+        transcribe_share = scheduler.allocation("transcribe")
+        record("transcribe_diarize_scheduled", scheduler.run_stages, {
+            "transcribe": (transcribe, (audio_path,), {
+                "cpu_threads": transcribe_share.threads,
+                "num_workers": transcribe_share.num_workers
+            }),
+            "diarize": (diarize, (audio_path,), {"num_threads": scheduler.allocation("diarize").threads}),
+        })
+
+    transcript = record("assign_speakers", assign_speakers, diarize_df, transcript, fill_nearest=False)
+    transcripts_dir = os.path.join(assets_dir, "users_segements")
+    os.makedirs(transcripts_dir, exist_ok=True)
+    transcript_path = os.path.join(transcripts_dir, "transcript.json")
+    record("transcript_save_json", save_to_json, transcript, transcript_path)
+    record("transcript_load_json", load_json, transcript_path)
+    record("transcript_save_columnar", save_transcript, transcript, transcript_path)
+    columns = record("transcript_load_columnar", ColumnarTranscript.load, columnar_path(transcript_path))
+    record("transcript_to_dict", columns.to_dict)
+
+    if "speaker_segmentation" in stages or "tts_timeline" in stages:
+        # The TTS stage clones voices from the per-speaker clips this stage writes
+        segmenter = SpeakerSegmentationService(assets_dir=assets_dir)
+        record("speaker_segmentation", segmenter.process_speaker_segmentation, transcript_path)
+
+    if "statistics" in stages:
+        record("statistics", main.generate_statistics, transcript.get("segments", []), diarize_df)
+
+    if "tts_timeline" in stages:
+        tts_service = VoiceCloningTTSService(assets_dir=assets_dir)
+        edited = edit_transcript_copy(transcript, edit_ratio)
+        differences = tts_service.find_transcript_differences(transcript, edited)
+        record("tts_timeline", tts_service.create_modified_audio_timeline_v2,
+               differences, os.path.join(workdir, "tts_output"))
+
+    if "summarize" in stages:
+        context = "\n".join(
+            f"{seg.get('speaker', 'Unknown')}: {seg['text'].strip()}" for seg in transcript["segments"]
+        )
+        # No cache: a warm cache would time a lookup, and stub summaries must not reach the server's cache
+        summarizer = HierarchicalSummarizer.from_config(main.llm_client.chat, main.config, cache=None)
+        record("summarize", asyncio.run, summarizer.summarize(context))
+
+    results = [r for r in results if r.stage in stages]
+    return {
+        "models": models,
+        "fixture": {"duration": duration, "speakers": speakers, "edit_ratio": edit_ratio},
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "scheduler": main.scheduler.describe(),
+        "diarization": diarization,
+        "stages": {r.stage: asdict(r) for r in results},
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Optional[Dict], tolerance: float) -> List[str]:
+    """List stages whose real-time factor regressed by more than the tolerance"""
+    if not baseline:
+        return []
+    regressions = []
+    for stage, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or previous["rtf"] <= 0:
+            continue
+        change = current["rtf"] / previous["rtf"] - 1.0
+        if change > tolerance:
+            regressions.append(f"{stage}: RTF {previous['rtf']:.4f} -> {current['rtf']:.4f} (+{change:.0%})")
+    return regressions
+
+
+def load_json(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_in_subprocess(models: str, argv: List[str]) -> Dict:
+    """Run one model mode in a fresh interpreter so stub patches never leak into real runs"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        report_path = f.name
+    cmd = [sys.executable, "-m", "benchmarks.run_benchmarks", *argv, "--models", models,
+           "--json", report_path, "--no-compare"]
+    subprocess.run(cmd, check=True)
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    os.remove(report_path)
+    return report
+
+
+def main_cli(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the LUNA backend pipeline stage by stage")
+    parser.add_argument("--models", choices=["stub", "real", "both"], default="stub")
+    parser.add_argument("--duration", type=float, default=60.0, help="Fixture length in seconds")
+    parser.add_argument("--speakers", type=int, default=2, help="Number of synthetic speakers")
+    parser.add_argument("--edit-ratio", type=float, default=0.2, help="Fraction of segments edited for the TTS stage")
+    parser.add_argument("--stages", nargs="+", choices=ALL_STAGES, default=ALL_STAGES)
+    parser.add_argument("--fixture-dir", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed RTF regression, 0.15 = 15%%")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--json", help="Write the report to this path")
+    parser.add_argument("--no-compare", action="store_true", help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    shared_argv = [
+        "--duration", str(options.duration), "--speakers", str(options.speakers),
+        "--edit-ratio", str(options.edit_ratio), "--fixture-dir", options.fixture_dir,
+        "--stages", *options.stages,
+    ]
+    if options.models == "both":
+        reports = {models: run_in_subprocess(models, shared_argv) for models in ("stub", "real")}
+    else:
+        reports = {options.models: run_suite(options.models, options.duration, options.speakers,
+                                              options.edit_ratio, options.stages, options.fixture_dir)}
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(reports if options.models == "both" else reports[options.models], f, indent=2)
+
+    if options.no_compare:
+        return 0
+
+    baseline = load_baseline(options.baseline)
+    exit_code = 0
+    for models, report in reports.items():
+        regressions = compare_to_baseline(report, baseline.get(models), options.tolerance)
+        for regression in regressions:
+            print(f"[Benchmark] REGRESSION ({models}) {regression}")
+        if regressions:
+            exit_code = 1
+        if options.save_baseline:
+            baseline[models] = report
+
+    if options.save_baseline:
+        with open(options.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"[Benchmark] Baseline saved to {options.baseline}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
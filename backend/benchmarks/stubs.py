@@ -0,0 +1,169 @@
+import asyncio
+import numpy as np
+import soundfile as sf
+from types import SimpleNamespace
+
+# Placeholder vocabulary for stub transcripts
+WORDS = ["the", "quick", "meeting", "agenda", "budget", "review", "next", "quarter", "team", "launch"]
+
+
+def _audio_duration(audio, sample_rate: int = 16000) -> float:
+    if isinstance(audio, str):
+        return sf.info(audio).duration
+    return len(audio) / sample_rate
+
+
+class StubWhisperModel:
+    """Stands in for faster_whisper.WhisperModel: emits a 3s segment cadence with word timings"""
+
+    def __init__(self, model_size_or_path="small", device="cpu", compute_type="default", **kwargs):
+        self.model_size = model_size_or_path
+
+    def transcribe(self, audio, beam_size=5, word_timestamps=False, **kwargs):
+        duration = _audio_duration(audio)
+
+        def segments():
+            start = 0.0
+            index = 0
+            while start < duration:
+                end = min(start + 3.0, duration)
+                words = []
+                position = start
+                while position + 0.3 <= end:
+                    words.append(SimpleNamespace(start=position, end=position + 0.3,
+                                                 word=" " + WORDS[(index + len(words)) % len(WORDS)]))
+                    position += 0.4
+                yield SimpleNamespace(
+                    start=start, end=end,
+                    text="".join(w.word for w in words),
+                    words=words if word_timestamps else None
+                )
+                start = end
+                index += 1
+
+        return segments(), SimpleNamespace(duration=duration, language="en")
+
+
+class _StubAnnotation:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def itertracks(self, yield_label=False):
+        for start, end, speaker in self.tracks:
+            turn = SimpleNamespace(start=start, end=end)
+            yield (turn, None, speaker) if yield_label else (turn, None)
+
+    def labels(self):
+        return sorted({speaker for _, _, speaker in self.tracks})
+
+
+class StubDiarizationPipeline:
+    """Stands in for pyannote Pipeline: fixed-length turns cycling through the speakers"""
+
+    num_speakers = 2
+    turn_length = 2.5
+    embedding_batch_size = 32
+
+    def __init__(self):
+        self._segmentation = SimpleNamespace(step=1.0, duration=10.0)
+
+    @classmethod
+    def from_pretrained(cls, checkpoint, use_auth_token=None):
+        return cls()
+
+    def __call__(self, audio_data, num_speakers=None, min_speakers=None, max_speakers=None, return_embeddings=False):
+        speakers = num_speakers or self.num_speakers
+        waveform = audio_data["waveform"]
+        duration = waveform.shape[-1] / audio_data["sample_rate"]
+        tracks = []
+        start = 0.0
+        index = 0
+        while start < duration:
+            end = min(start + self.turn_length, duration)
+            tracks.append((start, end, f"SPEAKER_{index % speakers:02d}"))
+            start = end
+            index += 1
+        annotation = _StubAnnotation(tracks)
+        if not return_embeddings:
+            return annotation
+        # One fixed vector per label, so the same labels match the same voices across runs
+        embeddings = np.stack([
+            np.random.default_rng(int(label.split("_")[-1])).standard_normal(256) for label in annotation.labels()
+        ]) if tracks else np.empty((0, 256))
+        return annotation, embeddings
+
+
+class StubXtts:
+    """Stands in for the Xtts model behind TTS.api.TTS: latents from the clip, a tone per text"""
+
+    config = SimpleNamespace(audio=SimpleNamespace(output_sample_rate=24000))
+    seconds_per_char = 0.06
+
+    def get_conditioning_latents(self, audio_path):
+        audio, _ = sf.read(audio_path[0], dtype="float32")
+        level = float(np.sqrt(np.mean(audio ** 2))) if len(audio) else 0.0
+        return np.full((1, 32, 1024), level, dtype=np.float32), np.full((1, 512, 1), level, dtype=np.float32)
+
+    def inference(self, text, language, gpt_cond_latent, speaker_embedding, **kwargs):
+        sample_rate = self.config.audio.output_sample_rate
+        t = np.arange(int(max(0.2, len(text) * self.seconds_per_char) * sample_rate)) / sample_rate
+        return {"wav": 0.2 * np.sin(2 * np.pi * 180 * t)}
+
+
+class StubTTS:
+    """Stands in for TTS.api.TTS: writes a tone whose length follows the text length"""
+
+    sample_rate = 24000
+    seconds_per_char = 0.06
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+        self.synthesizer = SimpleNamespace(tts_model=StubXtts())
+
+    def to(self, device):
+        return self
+
+    def tts_to_file(self, text, speaker_wav=None, file_path="output.wav", language="en", **kwargs):
+        duration = max(0.2, len(text) * self.seconds_per_char)
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        sf.write(file_path, (0.2 * np.sin(2 * np.pi * 180 * t)).astype(np.float32), self.sample_rate)
+        return file_path
+
+
+class StubImagineAsyncClient:
+    """Stands in for imagine.ImagineAsyncClient with a fixed per-call latency"""
+
+    latency = 0.05
+
+    def __init__(self, api_key=None, endpoint=None, **kwargs):
+        pass
+
+    async def health_check(self):
+        return {"status": "stub"}
+
+    async def chat(self, messages, model=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1].content
+        return SimpleNamespace(first_content=" ".join(prompt.split()[:40]))
+
+    async def chat_stream(self, messages, model=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for word in messages[-1].content.split()[:40]:
+            yield SimpleNamespace(choices=[None], first_content=word + " ")
+
+    async def close(self):
+        pass
+
+
+def install_stubs(num_speakers: int = 2):
+    """Swap heavy models for stubs. Must run before `main` is imported."""
+    import imagine
+    imagine.ImagineAsyncClient = StubImagineAsyncClient
+
+    import services.transcribe as transcribe_module
+    StubDiarizationPipeline.num_speakers = num_speakers
+    transcribe_module.WhisperModel = StubWhisperModel
+    transcribe_module.Pipeline = StubDiarizationPipeline
+
+    import services.tts_service as tts_module
+    tts_module.TTS = StubTTS
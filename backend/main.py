@@ -1,18 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
-from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 import tempfile
 import os
-from services.tts_service import run_voice_cloning_service
-from imagine import ImagineClient, ChatMessage
+import json
+import time
+import asyncio
+import contextvars
 from pydantic import BaseModel
 
 
 from pprint import pprint
-from typing import Dict, Any, List
-from services.transcribe import extract_audio_from_video,transcribe,diarize,assign_speakers,save_to_json,OUTPUT_DIR
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from services.transcribe import extract_audio_from_video,transcribe,diarize,assign_speakers,save_to_json,iter_transcribe,diarization_options,OUTPUT_DIR,SAMPLE_RATE,config
+from services.resource_scheduler import ResourceScheduler
+from services.metrics import track_stage, request_timings, render_metrics, CONTENT_TYPE, HTTP_SECONDS, QUEUE_DEPTH
+from services.profiling import SamplingProfiler, TraceStore, new_request_id, start_trace, save_profile
 from services.speaker_segmentation import SpeakerSegmentationService
+from services.statistics import generate_statistics
+from services.columnar_transcript import save_transcript
+from services.voice_library import VoiceLibrary, save_speaker_voices, load_speaker_voices, SPEAKER_VOICES_FILE
+from services.video_export import remember_source_video, export_video, export_path
+from services.transcript_index import TranscriptStore
+from services.segment_preview import SegmentPreviewService, PresynthesisWorker
+from services.summarizer import HierarchicalSummarizer
+from services.llm_client import AsyncLLMClient
+from services.summary_cache import SummaryCache
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 # Apply CORS
 app = FastAPI()
 app.add_middleware(
@@ -26,34 +40,151 @@ app.add_middleware(
 
 app = FastAPI()
 
-def process_video_analysis(video_path: str) -> Dict[str, Any]:
+scheduler = ResourceScheduler.from_config(config)
+# Recurring speakers are recognised across videos and reuse their reference audio and xTTS latents
+voice_library = VoiceLibrary.from_config(config, os.path.join(os.path.dirname(os.path.abspath(__file__)), "assests"))
+
+PROFILE_DIR = os.path.join("assests", "profiles")
+TRACING_ENABLED = config.get("tracing", False)
+PROFILE_SAMPLE_INTERVAL = config.get("profile_sample_interval", 0.005)
+traces = TraceStore()
+
+def _profiling_requested(request: Request) -> bool:
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    return str(flag).lower() in ("1", "true", "yes")
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    profile = _profiling_requested(request)
+    trace = start_trace(request_id) if (TRACING_ENABLED or profile) else None
+
+    profiler = None
+    if profile:
+        profiler = SamplingProfiler(interval=PROFILE_SAMPLE_INTERVAL)
+        trace.profiler = profiler
+        profiler.start()
+
+    def finish():
+        # Joins the sampler and writes the profile, so it runs off the event loop
+        if profiler is not None:
+            profiler.stop()
+            save_profile(profiler, trace, PROFILE_DIR)
+        if trace is not None:
+            traces.add(trace)
+
+    start = time.perf_counter()
     try:
-        audio_path = "assests/audio/extracted_audio.wav"
-        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
-        extract_audio_from_video(video_path, audio_path)
+        response = await call_next(request)
+    except BaseException:
+        await run_in_threadpool(finish)
+        raise
+
+    async def body_then_finish(body):
+        # Streaming endpoints do their work while the body is sent, after call_next returns
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            await run_in_threadpool(finish)
 
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            transcribe_future = executor.submit(transcribe, audio_path)
-            diarize_future = executor.submit(diarize, audio_path)
+    if profiler is not None or trace is not None:
+        response.body_iterator = body_then_finish(response.body_iterator)
 
-            transcript = transcribe_future.result()
-            diarize_df, audio = diarize_future.result()
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_SECONDS.observe(time.perf_counter() - start, path=path, method=request.method)
 
-        transcript = assign_speakers(diarize_df, transcript, fill_nearest=False)
+    response.headers["X-Request-ID"] = request_id
+    if profiler is not None:
+        response.headers["X-Profile-URL"] = f"/profiles/{request_id}"
+    return response
 
-        transcript_file_path = os.path.join(OUTPUT_DIR, "transcript.json")
-        save_to_json(transcript, transcript_file_path)
+@app.get("/profiles/{request_id}")
+def get_profile(request_id: str):
+    path = os.path.join(PROFILE_DIR, f"{new_request_id(request_id)}.speedscope.json")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
 
-        segmenter = SpeakerSegmentationService()
+@app.get("/traces/{request_id}")
+def get_trace(request_id: str):
+    trace = traces.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace.to_dict()
 
-        audio_paths = segmenter.process_speaker_segmentation(transcript_file_path)
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
 
-        statistics = generate_statistics(transcript.get("segments", []), diarize_df)
-    
+def process_video_analysis(video_path: str, diarization: Optional[Dict[str, Any]] = None,
+                           extracted_audio: Optional[str] = None, update_session: bool = True) -> Dict[str, Any]:
+    """
+    Transcribe, diarize and save a video as the current transcript.
+
+    `extracted_audio` is the video's audio already extracted elsewhere (the batch
+    command prefetches it), used instead of running ffmpeg again. With
+    `update_session` off the editor's session is left alone: no transcript,
+    audio, speaker clips or edits are replaced and no voices are enrolled;
+    known voices are still reported.
+    """
+    QUEUE_DEPTH.inc(queue="video_analysis")
+    try:
+        with request_timings() as timings:
+            start = time.perf_counter()
+            result = _process_video_analysis(video_path, diarization, extracted_audio, update_session)
+            timings["total"] = round(time.perf_counter() - start, 4)
+        result["timings"] = timings
+        return result
+    finally:
+        QUEUE_DEPTH.dec(queue="video_analysis")
+
+def _process_video_analysis(video_path: str, diarization: Optional[Dict[str, Any]] = None,
+                            extracted_audio: Optional[str] = None, update_session: bool = True) -> Dict[str, Any]:
+    temp_audio_path = None
+    try:
+        audio_path = "assests/audio/extracted_audio.wav"
+        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+        if not update_session:
+            # The editor's audio belongs to its own session; read this video's audio where it is
+            if extracted_audio:
+                audio_path = extracted_audio
+            else:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+                    temp_audio_path = audio_path = temp_file.name
+                extract_audio_from_video(video_path, audio_path)
+        elif extracted_audio:
+            # Speaker clips and the editor read the audio from the usual place
+            os.replace(extracted_audio, audio_path)
+        else:
+            extract_audio_from_video(video_path, audio_path)
+
+        transcribe_share = scheduler.allocation("transcribe")
+        diarize_share = scheduler.allocation("diarize")
+        # The two stages overlap, so their own timings do not add up to the time spent here
+        with track_stage("transcribe_diarize"):
+            results = scheduler.run_stages({
+                "transcribe": (transcribe, (audio_path,), {
+                    "cpu_threads": transcribe_share.threads,
+                    "num_workers": transcribe_share.num_workers
+                }),
+                "diarize": (diarize, (audio_path,), {"num_threads": diarize_share.threads, "options": diarization}),
+            })
+
+        transcript = results["transcribe"]
+        diarize_df, audio = results["diarize"]
+
+        transcript = assign_speakers(diarize_df, transcript, fill_nearest=False)
+        if update_session:
+            statistics, speakers = _finish_analysis(transcript, diarize_df, audio)
+        else:
+            statistics, speakers = _analysis_summary(transcript, diarize_df, audio)
         
         return {
             "transcription": transcript,
             "statistics": statistics,
+            "speakers": speakers,
             "status": "success"
         }
     
@@ -62,59 +193,153 @@ def process_video_analysis(video_path: str) -> Dict[str, Any]:
             "error": str(e),
             "status": "failed"
         }
+    finally:
+        if temp_audio_path and os.path.exists(temp_audio_path):
+            os.remove(temp_audio_path)
 
-def generate_statistics(combined_data, diarize_df) -> Dict[str, Any]:
-    """Generate statistics from the analysis results."""
+def _analysis_summary(transcript, diarize_df, audio) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Statistics and already-known voices, without touching the editor session or the voice library"""
+    speakers = {}
+    if voice_library is not None:
+        with track_stage("match_voices"):
+            matches = voice_library.match_speakers(diarize_df.attrs.get("speaker_embeddings", {}))
+        for label, (voice_id, similarity) in matches.items():
+            speakers[label] = {"voice_id": voice_id, "name": voice_library.voice(voice_id)["name"],
+                               "known": True, "similarity": round(similarity, 4)}
+    with track_stage("statistics"):
+        statistics = generate_statistics(transcript.get("segments", []), diarize_df,
+                                         duration=len(audio) / SAMPLE_RATE)
+    return statistics, speakers
+
+def _finish_analysis(transcript, diarize_df, audio) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Persist the labelled transcript, cut reference audio for new voices; return statistics and voices"""
+    transcript_file_path = os.path.join(OUTPUT_DIR, "transcript.json")
+    with track_stage("save_transcript"):
+        # Compact JSON for compatibility; the services read the columnar copy
+        save_to_json(transcript, transcript_file_path, indent=None)
+        save_transcript(transcript, transcript_file_path)
+        # Edits recorded against the previous transcript no longer apply
+        transcript_store.reset_edits()
+
+    embeddings = diarize_df.attrs.get("speaker_embeddings", {})
+    matches = {}
+    if voice_library is not None:
+        with track_stage("match_voices"):
+            matches = voice_library.match_speakers(embeddings)
+
+    segmenter = SpeakerSegmentationService()
+
+    audio_paths = segmenter.process_speaker_segmentation(transcript_file_path, skip_speakers=set(matches))
+
+    speakers = {}
+    if voice_library is not None:
+        speakers = voice_library.resolve_session(embeddings, matches, audio_paths)
+    save_speaker_voices(OUTPUT_DIR, speakers)
+    segment_previewer.invalidate_speakers()
+    if presynthesis is not None:
+        presynthesis.clear()
+
+    with track_stage("statistics"):
+        statistics = generate_statistics(transcript.get("segments", []), diarize_df,
+                                         duration=len(audio) / SAMPLE_RATE)
+    return statistics, speakers
+
+def stream_video_analysis(video_path: str, emit: Callable[[Dict[str, Any]], None],
+                          diarization: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Run the analysis and report results through `emit` as soon as they exist:
+    "segment" events while Whisper decodes, one "speakers" event once diarization
+    has labelled them, then "voices", "statistics" and "done" (or "error").
+    """
+    QUEUE_DEPTH.inc(queue="video_analysis")
     try:
-        speakers = set()
-        total_words = 0
-        speaker_word_counts = {}
-        
-        for segment in combined_data:
-            if not isinstance(segment, dict):
-                print(f"Warning: Skipping non-dictionary segment: {segment}")
-                continue
-
-            speaker = segment.get('speaker', 'Unknown')
-            speakers.add(speaker)
-            words = len(segment.get('text', '').split())
-            total_words += words
-            speaker_word_counts[speaker] = speaker_word_counts.get(speaker, 0) + words
-        
-        # Calculate speaking time per speaker from the diarization data.
-        speaker_times = {}
-        for speaker in speakers:
-            speaker_segments = diarize_df[diarize_df['speaker'] == speaker]
-            total_time = (speaker_segments['end'] - speaker_segments['start']).sum()
-            speaker_times[speaker] = float(total_time)
-        
-        return {
-            "total_speakers": len(speakers),
-            "total_words": total_words,
-            "speaker_word_counts": speaker_word_counts,
-            "speaker_speaking_times": speaker_times,
-            "speakers_list": list(speakers)
-        }
-    
+        with request_timings() as timings:
+            start = time.perf_counter()
+            audio_path = "assests/audio/extracted_audio.wav"
+            os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+            extract_audio_from_video(video_path, audio_path)
+
+            # Diarization runs in the background while segments stream from this thread
+            transcribe_share = scheduler.allocation("transcribe")
+            diarizing = scheduler.submit("diarize", diarize, audio_path, options=diarization,
+                                         num_threads=scheduler.allocation("diarize").threads)
+
+            emit({"type": "progress", "stage": "transcribe"})
+            segments = iter_transcribe(audio_path, cpu_threads=transcribe_share.threads,
+                                       num_workers=transcribe_share.num_workers)
+            transcript = {"segments": []}
+            with track_stage("transcribe"):
+                for index, segment in enumerate(segments):
+                    transcript["segments"].append(segment)
+                    emit({"type": "segment", "index": index, "segment": segment})
+
+            emit({"type": "progress", "stage": "diarize"})
+            with track_stage("wait_diarize"):
+                diarize_df, audio = diarizing.result()
+
+            transcript = assign_speakers(diarize_df, transcript, fill_nearest=False)
+            emit({"type": "speakers", "segments": [
+                {
+                    "index": index,
+                    "speaker": segment.get("speaker"),
+                    "word_speakers": [word.get("speaker") for word in segment.get("words", [])]
+                }
+                for index, segment in enumerate(transcript["segments"])
+            ]})
+
+            statistics, speakers = _finish_analysis(transcript, diarize_df, audio)
+            emit({"type": "voices", "speakers": speakers})
+            emit({"type": "statistics", "statistics": statistics})
+            timings["total"] = round(time.perf_counter() - start, 4)
+        emit({"type": "done", "segments": len(transcript["segments"]), "timings": timings})
+        return True
     except Exception as e:
-        return {"error": f"Statistics generation failed: {str(e)}"}
+        emit({"type": "error", "detail": str(e)})
+        return False
+    finally:
+        QUEUE_DEPTH.dec(queue="video_analysis")
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+class DiarizationParams(BaseModel):
+    """Optional query parameters for the analysis endpoints; unset ones fall back to config.yaml"""
+    diarization_mode: Optional[str] = None  # "full" or "fast" (diarize speech regions only)
+    num_speakers: Optional[int] = None
+    min_speakers: Optional[int] = None
+    max_speakers: Optional[int] = None
+
+    def options(self) -> Dict[str, Any]:
+        try:
+            return diarization_options({
+                "mode": self.diarization_mode,
+                "num_speakers": self.num_speakers,
+                "min_speakers": self.min_speakers,
+                "max_speakers": self.max_speakers,
+            })
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/analyze-video/")
-async def analyze_video(file: UploadFile = File(...)):
+async def analyze_video(file: UploadFile = File(...), params: DiarizationParams = Depends()):
+    diarization = params.options()
     try:
         # Validate file type
         if not file.filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
             raise HTTPException(status_code=400, detail="Invalid file format. Please upload a video file.")
         
         # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1].lower()) as temp_file:
             content = await file.read()
             temp_file.write(content)
             temp_video_path = temp_file.name
         
         try:
             # Process the video
-            result = process_video_analysis(temp_video_path)
+            result = process_video_analysis(temp_video_path, diarization)
+            if result.get("status") == "success":
+                # Kept for /export-video/
+                remember_source_video(temp_video_path, keep_copy=True)
             
             return JSONResponse(content=result)
         
@@ -125,26 +350,234 @@ async def analyze_video(file: UploadFile = File(...)):
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+@app.post("/analyze-video/stream")
+async def analyze_video_stream(file: UploadFile = File(...), params: DiarizationParams = Depends()):
+    """Server-Sent Events: transcript segments as they are decoded, then speaker labels and statistics"""
+    diarization = params.options()
+    if not file.filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a video file.")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1].lower()) as temp_file:
+        temp_file.write(await file.read())
+        temp_video_path = temp_file.name
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def emit(event: Dict[str, Any]):
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def run():
+        try:
+            if stream_video_analysis(temp_video_path, emit, diarization):
+                remember_source_video(temp_video_path, keep_copy=True)
+        finally:
+            if os.path.exists(temp_video_path):
+                os.remove(temp_video_path)
+
+    # The analysis finishes and saves the transcript even if the client disconnects
+    loop.run_in_executor(None, contextvars.copy_context().run, run)
+
+    async def events():
+        while True:
+            event = await queue.get()
+            yield _sse(event)
+            if event["type"] in ("done", "error"):
+                break
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 class TranscriptEdit(BaseModel):
     segments: Any
 
 @app.post("/edit-transcript/")
 async def edit_transcript(transcript: TranscriptEdit):
     try:
-        output_path = os.path.join(OUTPUT_DIR, "transcript-edited.json")
-        save_to_json({"segments": transcript.segments}, output_path)
-        final_audio_path = run_voice_cloning_service()
+        # Kept as edits, like PATCHes, so renders and exports all start from the same place
+        transcript_store.replace_edits(transcript.segments)
+        final_audio_path = _render_edited_audio()
         # Serve the audio file directly
         return FileResponse(final_audio_path, media_type="audio/wav", filename="final_edited_audio.wav")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save transcript: {str(e)}")
+
+# Where renders write the edited audio
+RENDERED_AUDIO_PATH = os.path.join("tts_output", "final_edited_audio_v2.wav")
+transcript_store = TranscriptStore(OUTPUT_DIR, rendered_paths=(RENDERED_AUDIO_PATH,))
+# Keeps xTTS loaded between previews and renders (plus tts_workers replica processes for renders)
+segment_previewer = SegmentPreviewService.from_config(config, transcript_store, voice_library)
+# Synthesizes edited segments while the user is still editing, so renders mostly hit the cache
+presynthesis = PresynthesisWorker.from_config(config, segment_previewer)
+
+@app.get("/transcript/segments")
+def get_transcript_segments(start: Optional[float] = None, end: Optional[float] = None,
+                            offset: int = 0, limit: int = 50, words: bool = True):
+    """Segments overlapping [start, end) in seconds, or a page of segments by position"""
+    try:
+        if start is not None or end is not None:
+            window_start = start if start is not None else 0.0
+            window_end = end if end is not None else float("inf")
+            segments = transcript_store.segments_in_window(window_start, window_end, include_words=words)
+        else:
+            segments = transcript_store.segments_page(offset, max(1, min(limit, 500)), include_words=words)
+        return {"segments": segments, "total_segments": len(transcript_store.index())}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/transcript/words")
+def get_transcript_words(start: float, end: float):
+    """Word timings overlapping [start, end) in seconds"""
+    try:
+        return {"words": transcript_store.words_in_window(start, end)}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+class SegmentPatch(BaseModel):
+    index: int
+    text: Optional[str] = None
+    speaker: Optional[str] = None
+    words: Optional[List[Dict[str, Any]]] = None
+
+class TranscriptPatch(BaseModel):
+    edits: List[SegmentPatch]
+
+def _schedule_presynthesis(indices: List[int]):
+    """Queue the text renders will need; renders keep each segment's original speaker"""
+    columns = transcript_store.index().columns
+    edits = transcript_store.edits()
+    for i in indices:
+        text = edits.get(i, {}).get("text")
+        if text is not None and text.strip():
+            presynthesis.schedule(i, text, columns.segment_dict(i).get("speaker", "SPEAKER_00"))
+        else:
+            presynthesis.cancel(i)
+
+@app.patch("/transcript/segments")
+def patch_transcript_segments(patch: TranscriptPatch):
+    """Record edits to individual segments without resending the whole transcript"""
+    try:
+        updated = transcript_store.apply_edits([edit.dict() for edit in patch.edits])
+        if presynthesis is not None:
+            _schedule_presynthesis(updated)
+        return {"updated": updated, "edited_segments": len(transcript_store.edits())}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class PreviewRequest(BaseModel):
+    index: int
+    text: Optional[str] = None  # defaults to the segment's current (edited) text
+    speaker: Optional[str] = None
+
+@app.post("/preview-segment")
+def preview_segment(request: PreviewRequest):
+    """Synthesize one edited segment and return it with a second of the original audio on each side"""
+    try:
+        start = time.perf_counter()
+        wav, info = segment_previewer.preview(request.index, request.text, request.speaker)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (IndexError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+    return Response(wav, media_type="audio/wav", headers={
+        "X-Preview-Cached": str(info["cached"]).lower(),
+        "X-Preview-Seconds": f"{time.perf_counter() - start:.3f}",
+    })
+
+def _render_is_current() -> bool:
+    """Whether the last render is newer than everything it was made from"""
+    if not os.path.exists(RENDERED_AUDIO_PATH):
+        return False
+    sources = [transcript_store.edited_path, transcript_store.transcript_path,
+               os.path.join(OUTPUT_DIR, SPEAKER_VOICES_FILE)]
+    rendered = os.path.getmtime(RENDERED_AUDIO_PATH)
+    return all(rendered > os.path.getmtime(path) for path in sources if os.path.exists(path))
+
+def _render_edited_audio() -> str:
+    """Synthesize the edited transcript, reusing the last render if nothing it depends on has changed since"""
+    # Rewrites transcript-edited.json only when its content changes, reverted edits included
+    transcript_store.materialize_edited()
+    if _render_is_current():
+        return RENDERED_AUDIO_PATH
+    return segment_previewer.render()
+
+@app.post("/transcript/render")
+async def render_transcript_edits():
+    """Apply the recorded segment edits and synthesize the edited audio"""
+    try:
+        final_audio_path = _render_edited_audio()
+        return FileResponse(final_audio_path, media_type="audio/wav", filename="final_edited_audio.wav")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render edits: {str(e)}")
+
+class ExportRequest(BaseModel):
+    audio_codec: str = "aac"  # "aac" or "opus"
+
+@app.post("/export-video/")
+def export_edited_video(request: ExportRequest = ExportRequest()):
+    """Put the edited audio back into the original video; only the audio is encoded"""
+    try:
+        start = time.perf_counter()
+        name = export_video(_render_edited_audio(), request.audio_codec)
+        return {
+            "url": f"/exports/{name}",
+            "size": os.path.getsize(export_path(name)),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+@app.get("/exports/{name}")
+def download_export(name: str):
+    """Serve an export; FileResponse streams it from disk and answers Range requests for seeking"""
+    path = export_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    media_type = "video/x-matroska" if name.endswith(".mkv") else None
+    return FileResponse(path, media_type=media_type, filename=name)
+
+@app.get("/voices")
+def list_voices():
+    """Voices in the library, and which of them each speaker of the current video is"""
+    if voice_library is None:
+        raise HTTPException(status_code=404, detail="The voice library is disabled")
+    return {"voices": voice_library.voices(), "speakers": load_speaker_voices(OUTPUT_DIR)}
+
+class VoiceRename(BaseModel):
+    name: str
+
+@app.patch("/voices/{voice_id}")
+def rename_voice(voice_id: str, request: VoiceRename):
+    if voice_library is None:
+        raise HTTPException(status_code=404, detail="The voice library is disabled")
+    try:
+        return voice_library.rename(voice_id, request.name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.post("/analyze-video-path/")
-async def analyze_video_from_path(video_path: str):
+async def analyze_video_from_path(video_path: str, params: DiarizationParams = Depends()):
+    diarization = params.options()
     try:
         if not os.path.exists(video_path):
             raise HTTPException(status_code=404, detail="Video file not found")
         
-        result = process_video_analysis(video_path)
+        result = process_video_analysis(video_path, diarization)
+        if result.get("status") == "success":
+            remember_source_video(video_path, keep_copy=False)
         
         return JSONResponse(content=result)
     
@@ -153,45 +586,68 @@ async def analyze_video_from_path(video_path: str):
 class SummarizeRequest(BaseModel):
     context: str
 
-# init client
-print("Setting up client...")
-client = ImagineClient(
-    api_key="f66499e9-2d54-4adf-85c1-5c9d67a13b1b",
-    endpoint="http://10.190.147.82:5050/v2"
-)
-print("Client connected.")
+# Shared async LLM client: keep-alive pool, bounded concurrency, timeouts and retries
+llm_client = AsyncLLMClient.from_config(config)
+summary_cache = SummaryCache.from_config(config)
+summarizer = HierarchicalSummarizer.from_config(llm_client.chat, config, stream_fn=llm_client.stream,
+                                                cache=summary_cache)
+
+@app.on_event("startup")
+async def check_llm_health():
+    print("Checking health...")
+    pprint(await llm_client.health_check())
 
-# health check
-print("Checking health...")
-health = client.health_check()
-pprint(health)
+@app.on_event("startup")
+async def preload_tts():
+    if config.get("tts_preload", False):
+        # Load in the background so the server starts accepting requests right away
+        asyncio.get_running_loop().run_in_executor(None, segment_previewer.tts)
 
-# list models
-print("Listing models...")
-models = client.get_available_models_by_type()
-pprint(models)
+@app.on_event("shutdown")
+async def close_clients():
+    await llm_client.close()
+    summary_cache.close()
+    if presynthesis is not None:
+        presynthesis.stop()
+    segment_previewer.shutdown()
+    scheduler.shutdown()
 
-def summarize_text(context: str, language: str = "English") -> str:
+async def summarize_text(context: str, language: str = "English", segments: Optional[List[Dict[str, Any]]] = None,
+                         window_seconds: Optional[float] = None) -> str:
     """
     Summarizes the given context in the specified language using the Sarvam-m model.
+    Long transcripts are split by speaker turn and summarized map-reduce style;
+    transcript segments, when given, are also split into time windows.
     """
-    prompt = f"Summarize the following text in {language}:\n{context}"
-    response = client.chat(
-        messages=[
-            ChatMessage(role="user", content=prompt),
-        ],
-        model="Sarvam-m"
-    )
-    return response.first_content
+    with track_stage("summarize"):
+        return await summarizer.summarize(context, language, segments, window_seconds)
 
 class SummarizeRequest(BaseModel):
-    context: str
+    context: str = ""
     language: str = "English"
+    # Transcript segments (start, speaker, text) to summarize instead of context
+    segments: Optional[List[Dict[str, Any]]] = None
+    window_seconds: Optional[float] = None  # defaults to summary_window_seconds
 
 @app.post("/summarize")
-def summarize_endpoint(request: SummarizeRequest):
-    summary = summarize_text(request.context, request.language)
+async def summarize_endpoint(request: SummarizeRequest):
+    summary = await summarize_text(request.context, request.language, request.segments, request.window_seconds)
     return {"summary": summary}
+
+@app.post("/summarize/stream")
+async def summarize_stream_endpoint(request: SummarizeRequest):
+    """Server-Sent Events: a progress event, the summary tokens as they arrive, then done"""
+    async def events():
+        try:
+            with track_stage("summarize"):
+                async for event in summarizer.stream(request.context, request.language,
+                                                     request.segments, request.window_seconds):
+                    yield _sse(event)
+        except Exception as e:
+            yield _sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="localhost", port=8000 )
\ No newline at end of file
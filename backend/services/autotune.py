@@ -0,0 +1,224 @@
+"""
+Pick the fastest accurate-enough Whisper settings for this host.
+
+Run from the backend directory on the machine that will serve requests:
+
+    python -m services.autotune --clip assests/audio/reference.wav --reference reference.txt
+    python -m services.autotune --clip talk.mp4 --target-rtf 0.3 --max-wer 0.12 --models base small
+
+Every combination of model size, compute type, cpu_threads and beam size is
+timed on the clip. The most accurate combination whose real-time factor
+(wall time / audio seconds) and word error rate are within budget is written
+to config.yaml as model_size, compute_type, whisper_threads and beam_size.
+The thread count is measured with Whisper running alone, so it goes to
+whisper_threads (live transcription, standalone transcribe calls), not to
+transcribe_threads, the scheduler's split of the cores with pyannote.
+
+Without --reference, the most accurate candidate (largest model, float32,
+widest beam) is used as the reference and WER is measured relative to it.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+from operator import attrgetter
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from faster_whisper import WhisperModel, decode_audio
+
+from services.resource_scheduler import available_cpus
+
+SAMPLE_RATE = 16000
+MODEL_ORDER = ["tiny", "base", "small", "medium", "large-v1", "large-v2", "large-v3"]
+
+
+@dataclass
+class Candidate:
+    model_size: str
+    compute_type: str
+    cpu_threads: int
+    beam_size: int
+
+
+@dataclass
+class TuneResult:
+    model_size: str
+    compute_type: str
+    cpu_threads: int
+    beam_size: int
+    load_time: float
+    wall_time: float
+    rtf: float
+    wer: Optional[float] = None
+    text: str = ""
+
+
+def normalize_words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def default_thread_counts() -> List[int]:
+    cpus = len(available_cpus())
+    return sorted({max(1, cpus // 4), max(1, cpus // 2), cpus})
+
+
+def run_candidates(audio, candidates: List[Candidate]) -> List[TuneResult]:
+    """Time every candidate, loading each (model, compute type, threads) combination once"""
+    duration = len(audio) / SAMPLE_RATE
+    results = []
+    load_key = attrgetter("model_size", "compute_type", "cpu_threads")
+    for (model_size, compute_type, cpu_threads), group in itertools.groupby(candidates, key=load_key):
+        print(f"[Autotune] Loading {model_size} ({compute_type}, {cpu_threads} threads)...")
+        start = time.perf_counter()
+        try:
+            model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+        except ValueError as e:
+            # CTranslate2 rejects compute types the CPU cannot run
+            print(f"[Autotune] Skipping {model_size} {compute_type}: {e}")
+            continue
+        load_time = time.perf_counter() - start
+
+        # Warm up so one-time initialization is not billed to the first beam size
+        list(model.transcribe(audio[:SAMPLE_RATE * 5], beam_size=1)[0])
+
+        for candidate in group:
+            start = time.perf_counter()
+            segments, _ = model.transcribe(audio, beam_size=candidate.beam_size)
+            text = " ".join(segment.text.strip() for segment in segments)
+            wall_time = time.perf_counter() - start
+            result = TuneResult(**asdict(candidate), load_time=round(load_time, 3),
+                                wall_time=round(wall_time, 3), rtf=round(wall_time / duration, 4), text=text)
+            print(f"[Autotune] {model_size:<9} {compute_type:<8} threads={cpu_threads:<3} "
+                  f"beam={candidate.beam_size}  RTF {result.rtf:.3f}")
+            results.append(result)
+        del model
+    return results
+
+
+def score(results: List[TuneResult], reference: Optional[str]):
+    """Fill in WER against the reference text, or against the most accurate candidate's output"""
+    if reference is None:
+        best = max(results, key=lambda r: (MODEL_ORDER.index(r.model_size) if r.model_size in MODEL_ORDER else -1,
+                                           r.compute_type == "float32", r.beam_size))
+        print(f"[Autotune] No reference text; measuring WER against {best.model_size} {best.compute_type} "
+              f"beam={best.beam_size}")
+        reference = best.text
+    for result in results:
+        result.wer = round(word_error_rate(reference, result.text), 4)
+
+
+def select_best(results: List[TuneResult], target_rtf: float, max_wer: float) -> Optional[TuneResult]:
+    """Lowest WER within both budgets; ties go to the faster configuration"""
+    eligible = [r for r in results if r.rtf <= target_rtf and r.wer <= max_wer]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda r: (r.wer, r.rtf))
+
+
+def _yaml_value(value) -> str:
+    return f'"{value}"' if isinstance(value, str) else json.dumps(value)
+
+
+def update_config(path: str, values: Dict):
+    """Set keys in config.yaml in place, keeping every other line and the trailing comments"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    remaining = dict(values)
+    for i, line in enumerate(lines):
+        match = re.match(r"^(\w+):(\s*)([^#]*?)(\s*#.*)?$", line)
+        if match and match.group(1) in remaining:
+            key = match.group(1)
+            lines[i] = f"{key}: {_yaml_value(remaining.pop(key))}{match.group(4) or ''}"
+    for key, value in remaining.items():
+        lines.append(f"{key}: {_yaml_value(value)}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Whisper settings on this host and tune config.yaml")
+    parser.add_argument("--clip", required=True, help="Reference audio or video clip")
+    parser.add_argument("--reference", help="Text file with the correct transcript of the clip")
+    parser.add_argument("--target-rtf", type=float, default=0.5, help="Highest acceptable wall time / audio time")
+    parser.add_argument("--max-wer", type=float, default=0.15, help="Highest acceptable word error rate")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--compute-types", nargs="+", default=["int8", "int16", "float32"])
+    parser.add_argument("--threads", nargs="+", type=int, default=None,
+                        help="cpu_threads values to try (default: a quarter, half and all of the cores)")
+    parser.add_argument("--beam-sizes", nargs="+", type=int, default=[1, 5], help="1 = greedy decoding")
+    parser.add_argument("--max-seconds", type=float, default=120.0, help="Only use the start of long clips")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--json", help="Write every measurement to this path")
+    parser.add_argument("--dry-run", action="store_true", help="Report the choice without writing config.yaml")
+    options = parser.parse_args(args)
+
+    audio = decode_audio(options.clip, sampling_rate=SAMPLE_RATE)[:int(options.max_seconds * SAMPLE_RATE)]
+    print(f"[Autotune] Clip: {len(audio) / SAMPLE_RATE:.1f}s of audio, {len(available_cpus())} CPUs available")
+
+    reference = None
+    if options.reference:
+        with open(options.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+
+    candidates = [
+        Candidate(model_size, compute_type, threads, beam_size)
+        for model_size, compute_type, threads, beam_size in itertools.product(
+            options.models, options.compute_types, options.threads or default_thread_counts(), options.beam_sizes)
+    ]
+    results = run_candidates(audio, candidates)
+    if not results:
+        print("[Autotune] No candidate could be loaded")
+        return 1
+    score(results, reference)
+
+    print(f"\n{'model':<10}{'compute':<9}{'threads':>8}{'beam':>6}{'RTF':>9}{'WER':>8}")
+    for r in sorted(results, key=lambda r: r.rtf):
+        print(f"{r.model_size:<10}{r.compute_type:<9}{r.cpu_threads:>8}{r.beam_size:>6}{r.rtf:>9.3f}{r.wer:>8.3f}")
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+
+    best = select_best(results, options.target_rtf, options.max_wer)
+    if best is None:
+        print(f"\n[Autotune] No configuration meets RTF <= {options.target_rtf} and WER <= {options.max_wer}; "
+              f"config.yaml left unchanged")
+        return 1
+
+    values = {
+        "model_size": best.model_size,
+        "compute_type": best.compute_type,
+        "whisper_threads": best.cpu_threads,
+        "beam_size": best.beam_size,
+    }
+    print(f"\n[Autotune] Best: {values} (RTF {best.rtf:.3f}, WER {best.wer:.3f})")
+    if options.dry_run:
+        return 0
+    if not os.path.exists(options.config):
+        print(f"[Autotune] {options.config} not found; copy config-example.yaml first")
+        return 1
+    update_config(options.config, values)
+    print(f"[Autotune] Updated {options.config}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
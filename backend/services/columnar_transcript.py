@@ -0,0 +1,262 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+from typing import Dict, Iterator, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+NO_SPEAKER = -1
+
+# Arrays written to disk, one .npy file each so they can be memory-mapped independently
+_ARRAYS = (
+    "seg_start", "seg_end", "seg_speaker", "seg_text_offsets", "seg_word_offsets", "seg_text",
+    "word_start", "word_end", "word_speaker", "word_text_offsets", "word_text",
+)
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    if lengths:
+        np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _decode_all(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+class SegmentView:
+    """Read-only view of one segment; values are read from the columns on access"""
+    __slots__ = ("_transcript", "index")
+
+    def __init__(self, transcript: "ColumnarTranscript", index: int):
+        self._transcript = transcript
+        self.index = index
+
+    @property
+    def start(self) -> float:
+        return float(self._transcript.seg_start[self.index])
+
+    @property
+    def end(self) -> float:
+        return float(self._transcript.seg_end[self.index])
+
+    @property
+    def speaker(self) -> Optional[str]:
+        return self._transcript.speaker_name(int(self._transcript.seg_speaker[self.index]))
+
+    @property
+    def text(self) -> str:
+        t = self._transcript
+        a, b = int(t.seg_text_offsets[self.index]), int(t.seg_text_offsets[self.index + 1])
+        return t.seg_text[a:b].tobytes().decode("utf-8")
+
+    @property
+    def word_range(self) -> range:
+        t = self._transcript
+        return range(int(t.seg_word_offsets[self.index]), int(t.seg_word_offsets[self.index + 1]))
+
+    @property
+    def words(self) -> List[Dict]:
+        return self._transcript.words_between(self.word_range.start, self.word_range.stop)
+
+    def to_dict(self) -> Dict:
+        return self._transcript.segment_dict(self.index)
+
+
+class ColumnarTranscript:
+    """
+    Transcript held as parallel NumPy arrays instead of a dict per word.
+
+    Segment and word timings are float64 columns, speakers are int32 codes into
+    `speakers`, and text is one UTF-8 byte array per level with offsets into it.
+    On disk each column is a .npy file in a directory, so loading is a memory map
+    and only the pages that are actually read get touched.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], speakers: List[str]):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.speakers = list(speakers)
+
+    # Construction and conversion
+
+    @classmethod
+    def from_dict(cls, transcript: Dict) -> "ColumnarTranscript":
+        """Build the columns from the JSON shape produced by transcribe()/assign_speakers()"""
+        segments = transcript.get("segments", [])
+        speaker_codes = {}
+
+        def code(name):
+            if not name:
+                return NO_SPEAKER
+            return speaker_codes.setdefault(name, len(speaker_codes))
+
+        words = [w for s in segments for w in (s.get("words") or [])]
+        seg_texts = [(s.get("text") or "").encode("utf-8") for s in segments]
+        word_texts = [(w.get("word") or "").encode("utf-8") for w in words]
+
+        arrays = {
+            "seg_start": np.array([s.get("start") or 0.0 for s in segments], dtype=np.float64),
+            "seg_end": np.array([s.get("end") or 0.0 for s in segments], dtype=np.float64),
+            "seg_speaker": np.array([code(s.get("speaker")) for s in segments], dtype=np.int32),
+            "seg_text_offsets": _offsets([len(t) for t in seg_texts]),
+            "seg_word_offsets": _offsets([len(s.get("words") or []) for s in segments]),
+            "seg_text": np.frombuffer(b"".join(seg_texts), dtype=np.uint8),
+            "word_start": np.array([w.get("start") or 0.0 for w in words], dtype=np.float64),
+            "word_end": np.array([w.get("end") or 0.0 for w in words], dtype=np.float64),
+            "word_speaker": np.array([code(w.get("speaker")) for w in words], dtype=np.int32),
+            "word_text_offsets": _offsets([len(t) for t in word_texts]),
+            "word_text": np.frombuffer(b"".join(word_texts), dtype=np.uint8),
+        }
+        return cls(arrays, list(speaker_codes))
+
+    def speaker_name(self, code: int) -> Optional[str]:
+        return self.speakers[code] if code != NO_SPEAKER else None
+
+    def words_between(self, first: int, last: int) -> List[Dict]:
+        """Word dicts for the word index range [first, last)"""
+        offsets = self.word_text_offsets[first:last + 1]
+        texts = _decode_all(self.word_text[offsets[0]:offsets[-1]], offsets - offsets[0]) if last > first else []
+        starts = self.word_start[first:last].tolist()
+        ends = self.word_end[first:last].tolist()
+        codes = self.word_speaker[first:last].tolist()
+        words = []
+        for start, end, text, code in zip(starts, ends, texts, codes):
+            word = {"start": start, "end": end, "word": text}
+            if code != NO_SPEAKER:
+                word["speaker"] = self.speakers[code]
+            words.append(word)
+        return words
+
+    def segment_dict(self, index: int) -> Dict:
+        view = SegmentView(self, index)
+        segment = {"start": view.start, "end": view.end, "text": view.text, "words": view.words}
+        if view.speaker is not None:
+            segment["speaker"] = view.speaker
+        return segment
+
+    def to_dict(self, first: int = 0, last: Optional[int] = None) -> Dict:
+        """Rebuild the JSON shape the API returns, optionally for a slice of segments"""
+        last = len(self) if last is None else min(last, len(self))
+        if last <= first:
+            return {"segments": []}
+
+        seg_offsets = self.seg_text_offsets[first:last + 1]
+        seg_texts = _decode_all(self.seg_text[seg_offsets[0]:seg_offsets[-1]], seg_offsets - seg_offsets[0])
+        word_bounds = self.seg_word_offsets[first:last + 1].tolist()
+        all_words = self.words_between(word_bounds[0], word_bounds[-1])
+        base = word_bounds[0]
+
+        starts = self.seg_start[first:last].tolist()
+        ends = self.seg_end[first:last].tolist()
+        codes = self.seg_speaker[first:last].tolist()
+        segments = []
+        for i, (start, end, text, code) in enumerate(zip(starts, ends, seg_texts, codes)):
+            segment = {
+                "start": start,
+                "end": end,
+                "text": text,
+                "words": all_words[word_bounds[i] - base:word_bounds[i + 1] - base],
+            }
+            if code != NO_SPEAKER:
+                segment["speaker"] = self.speakers[code]
+            segments.append(segment)
+        return {"segments": segments}
+
+    def __len__(self) -> int:
+        return len(self.seg_start)
+
+    def __iter__(self) -> Iterator[SegmentView]:
+        return (SegmentView(self, i) for i in range(len(self)))
+
+    def segment(self, index: int) -> SegmentView:
+        if not 0 <= index < len(self):
+            raise IndexError(f"Segment {index} out of range (0-{len(self) - 1})")
+        return SegmentView(self, index)
+
+    @property
+    def num_words(self) -> int:
+        return len(self.word_start)
+
+    # Storage
+
+    def save(self, path: str):
+        """
+        Write one .npy per column plus meta.json into `path`.
+
+        The new copy is written next to the old one and the two are swapped by
+        renames, so `path` is missing only between two renames and a crash never
+        leaves a half-written copy in place.
+        """
+        tmp_path = f"{path}.tmp"
+        old_path = f"{path}.old"
+        for leftover in (tmp_path, old_path):
+            if os.path.exists(leftover):
+                shutil.rmtree(leftover)
+        os.makedirs(tmp_path)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "speakers": self.speakers,
+                "num_segments": len(self),
+                "num_words": self.num_words,
+            }, f)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        logger.info(f"Saved columnar transcript ({len(self)} segments, {self.num_words} words) to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ColumnarTranscript":
+        """Open a saved transcript; with mmap the columns are paged in lazily as they are read"""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar transcript version {meta.get('version')} in {path}")
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS}
+        return cls(arrays, meta["speakers"])
+
+
+def columnar_path(json_path: str) -> str:
+    """Where the columnar copy of a transcript JSON lives"""
+    root, _ = os.path.splitext(json_path)
+    return f"{root}.columns"
+
+
+def save_transcript(transcript: Dict, json_path: str) -> ColumnarTranscript:
+    """Store the columnar copy alongside the JSON transcript"""
+    columns = ColumnarTranscript.from_dict(transcript)
+    columns.save(columnar_path(json_path))
+    return columns
+
+
+def load_transcript_columns(json_path: str) -> Optional[ColumnarTranscript]:
+    """The columnar copy of a transcript, if it exists and is at least as new as the JSON"""
+    path = columnar_path(json_path)
+    meta = os.path.join(path, "meta.json")
+    if not os.path.exists(meta):
+        return None
+    if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(meta):
+        return None
+    return ColumnarTranscript.load(path)
+
+
+def load_transcript(json_path: str) -> Dict:
+    """Load a transcript in the JSON shape, from the columnar copy when one is current"""
+    columns = load_transcript_columns(json_path)
+    if columns is not None:
+        return columns.to_dict()
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
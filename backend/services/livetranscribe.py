@@ -4,17 +4,20 @@ import queue
 import sounddevice as sd
 import sys
 import threading
+import time
 import yaml
 
 from concurrent.futures import ThreadPoolExecutor
 from faster_whisper import WhisperModel
+from services.metrics import track_stage, AUDIO_SECONDS, MODEL_LOAD_SECONDS, QUEUE_DEPTH
 
 
 def process_transcription(
     whisper: WhisperModel,
     chunk: np.ndarray,
     silence_threshold: float,
-    sample_rate: int
+    sample_rate: int,
+    beam_size: int = 5
 ) -> None:
     """
     Process a chunk of audio data and transcribe it using the Whisper model.
@@ -25,15 +28,18 @@ def process_transcription(
     - chunk: Audio data chunk to be transcribed (numpy array)
     - silence_threshold: Threshold for silence detection
     - sample_rate: Sample rate for audio recording
+    - beam_size: Beam size for decoding (1 = greedy)
     """
     
+    AUDIO_SECONDS.inc(len(chunk) / sample_rate, stage="live_transcribe")
     if np.abs(chunk).mean() > silence_threshold:
         # faster-whisper expects audio data as float32 numpy array
         # Transcribe the audio chunk
-        segments, _ = whisper.transcribe(chunk, beam_size=5)
-        
-        # Combine all segments into a single transcript
-        transcript = " ".join([segment.text for segment in segments])
+        with track_stage("live_transcribe"):
+            segments, _ = whisper.transcribe(chunk, beam_size=beam_size)
+
+            # Combine all segments into a single transcript
+            transcript = " ".join([segment.text for segment in segments])
         
         if transcript.strip():
             print(f"Transcript: {transcript}")
@@ -46,7 +52,8 @@ def process_audio(
     queue_timeout: float,
     chunk_samples: int,
     silence_threshold: float,
-    sample_rate: int
+    sample_rate: int,
+    beam_size: int = 5
 ) -> None:
     """
     Process audio data from the queue and transcribe it using the Whisper model.
@@ -61,6 +68,7 @@ def process_audio(
     - chunk_samples: Number of samples in each audio chunk
     - silence_threshold: Threshold for silence detection
     - sample_rate: Sample rate for audio recording
+    - beam_size: Beam size for decoding (1 = greedy)
     """
 
     buffer = np.empty((0,), dtype=np.float32)
@@ -83,10 +91,14 @@ def process_audio(
                         whisper,
                         current_chunk,
                         silence_threshold,
-                        sample_rate
+                        sample_rate,
+                        beam_size
                     )
                     futures = [f for f in futures if not f.done()] + [future]
 
+                QUEUE_DEPTH.set(audio_queue.qsize(), queue="live_audio")
+                QUEUE_DEPTH.set(len(futures), queue="live_transcription")
+
             except queue.Empty:
                 continue
             
@@ -152,14 +164,20 @@ class LiveTranscriber:
         self.model_size = config.get("model_size", "small")
         self.device = config.get("device", "cpu")  # can be "cpu", "cuda", or "auto"
         self.compute_type = config.get("compute_type", "int8")  # can be "float16", "int8", etc.
+        self.beam_size = config.get("beam_size", 5)  # 1 = greedy decoding
+        # Live transcription has the cores to itself, like the autotuner's measurements
+        self.cpu_threads = config.get("whisper_threads") or config.get("transcribe_threads", 0)  # 0 = let CTranslate2 decide
 
         # initialize the faster-whisper model
         print(f"Loading faster-whisper {self.model_size} model...")
+        start = time.perf_counter()
         self.model = WhisperModel(
             self.model_size, 
             device=self.device, 
-            compute_type=self.compute_type
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads
         )
+        MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, model="whisper_live")
 
         # initialize the audio queue and stop event
         self.audio_queue = queue.Queue()
@@ -181,7 +199,8 @@ class LiveTranscriber:
                 self.queue_timeout,
                 self.chunk_samples,
                 self.silence_threshold,
-                self.sample_rate
+                self.sample_rate,
+                self.beam_size
             )
         )
         process_thread.start()
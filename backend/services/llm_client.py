@@ -0,0 +1,145 @@
+import time
+import random
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional
+
+from imagine import ImagineAsyncClient, ChatMessage, ImagineException
+from imagine.exceptions import ImagineAPIException
+
+from services.metrics import QUEUE_DEPTH, STAGE_SECONDS, Counter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_RETRIES = Counter("luna_llm_retries_total", "LLM calls retried after a timeout or transient error")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, 429 and 5xx are worth retrying; other 4xx are not"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    if isinstance(error, ImagineAPIException):
+        status = error.http_status
+        return status is None or status in (408, 429) or status >= 500
+    return isinstance(error, ImagineException)
+
+
+class AsyncLLMClient:
+    """Shared async client for the Imagine LLM endpoint: pooled connections, bounded concurrency, timeouts and retries"""
+
+    def __init__(self, endpoint: str, api_key: str, model: str = "Sarvam-m", max_concurrency: int = 8,
+                 timeout: float = 60.0, max_retries: int = 3, backoff: float = 0.5):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = None
+        self._loop = None
+        self._semaphore = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "AsyncLLMClient":
+        config = config or {}
+        return cls(
+            endpoint=config.get("llm_endpoint") or "http://10.190.147.82:5050/v2",
+            api_key=config.get("llm_api_key") or "f66499e9-2d54-4adf-85c1-5c9d67a13b1b",
+            model=config.get("llm_model", "Sarvam-m"),
+            max_concurrency=config.get("llm_max_concurrency", 8),
+            timeout=config.get("llm_timeout", 60.0),
+            max_retries=config.get("llm_max_retries", 3),
+        )
+
+    def _ensure_client(self) -> ImagineAsyncClient:
+        """One keep-alive connection pool per event loop; httpx pools cannot cross loops"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = ImagineAsyncClient(
+                api_key=self.api_key,
+                endpoint=self.endpoint,
+                # Retries and backoff are handled here, with a shorter schedule than the SDK's
+                max_retries=1,
+                timeout=self.timeout,
+                max_concurrent_requests=self.max_concurrency,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _backoff(self, attempt: int, error: Exception):
+        delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+        LLM_RETRIES.inc()
+        logger.warning(f"LLM call failed ({error!r}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+        await asyncio.sleep(delay)
+
+    async def chat(self, prompt: str) -> str:
+        """Complete a single user prompt and return the reply text"""
+        client = self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            QUEUE_DEPTH.inc(queue="llm_waiting")
+            async with self._semaphore:
+                QUEUE_DEPTH.dec(queue="llm_waiting")
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        client.chat(messages=[ChatMessage(role="user", content=prompt)], model=self.model),
+                        timeout=self.timeout,
+                    )
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_call")
+                    return response.first_content or ""
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    error = e
+            await self._backoff(attempt, error)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream the reply as it is generated.
+
+        The timeout applies to each wait for the next token. A failed call is retried
+        only if nothing has been yielded yet, so callers never see duplicated text.
+        """
+        client = self._ensure_client()
+        for attempt in range(self.max_retries + 1):
+            yielded = False
+            QUEUE_DEPTH.inc(queue="llm_waiting")
+            async with self._semaphore:
+                QUEUE_DEPTH.dec(queue="llm_waiting")
+                start = time.perf_counter()
+                try:
+                    chunks = client.chat_stream(messages=[ChatMessage(role="user", content=prompt)], model=self.model)
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        token = chunk.first_content if chunk.choices else None
+                        if token:
+                            if not yielded:
+                                STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_first_token")
+                            yielded = True
+                            yield token
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_call")
+                    return
+                except Exception as e:
+                    if yielded or attempt >= self.max_retries or not _is_retryable(e):
+                        raise
+                    error = e
+            await self._backoff(attempt, error)
+
+    async def health_check(self) -> Optional[Dict]:
+        try:
+            health = await asyncio.wait_for(self._ensure_client().health_check(), timeout=self.timeout)
+            return health.model_dump() if hasattr(health, "model_dump") else health
+        except Exception as e:
+            logger.warning(f"LLM health check failed: {e}")
+            return None
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
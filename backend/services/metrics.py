@@ -0,0 +1,255 @@
+import copy
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from services.profiling import span
+
+# Latency buckets in seconds, wide enough for both a 10ms lookup and a 10 minute transcription
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class _Metric:
+    """Base for the metric types; values are kept per label set"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.register(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return copy.deepcopy(self._values)
+
+    def changes_since(self, before: Dict) -> Dict:
+        """Updates made since `snapshot()` returned `before`, in a form merge() can replay"""
+        return {}
+
+    def merge(self, changes: Dict):
+        pass
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def changes_since(self, before: Dict) -> Dict:
+        with self._lock:
+            return {key: value - before.get(key, 0.0) for key, value in self._values.items()
+                    if value != before.get(key, 0.0)}
+
+    def merge(self, changes: Dict):
+        with self._lock:
+            for key, amount in changes.items():
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. a queue depth; describes this process only, so never merged"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def changes_since(self, before: Dict) -> Dict:
+        changes = {}
+        with self._lock:
+            for key, state in self._values.items():
+                old = before.get(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                if state["count"] != old["count"]:
+                    changes[key] = {
+                        "buckets": [n - o for n, o in zip(state["buckets"], old["buckets"])],
+                        "sum": state["sum"] - old["sum"],
+                        "count": state["count"] - old["count"],
+                    }
+        return changes
+
+    def merge(self, changes: Dict):
+        with self._lock:
+            for key, change in changes.items():
+                state = self._values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                state["buckets"] = [n + c for n, c in zip(state["buckets"], change["buckets"])]
+                state["sum"] += change["sum"]
+                state["count"] += change["count"]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, state in self._values.items():
+                for bound, count in zip(self.buckets, state["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {state['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {state['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Collects every metric defined in the process"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def changes_since(self, before: Dict[str, Dict]) -> Dict[str, Dict]:
+        changes = {}
+        for metric in self._metrics:
+            metric_changes = metric.changes_since(before.get(metric.name, {}))
+            if metric_changes:
+                changes[metric.name] = metric_changes
+        return changes
+
+    def merge(self, changes: Dict[str, Dict]):
+        for metric in self._metrics:
+            if metric.name in changes:
+                metric.merge(changes[metric.name])
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram("luna_stage_duration_seconds", "Wall time of each pipeline stage")
+AUDIO_SECONDS = Counter("luna_audio_seconds_processed_total", "Seconds of audio processed per stage")
+MODEL_LOAD_SECONDS = Histogram("luna_model_load_seconds", "Time spent loading a model")
+CACHE_REQUESTS = Counter("luna_cache_requests_total", "Cache lookups by cache and result (hit or miss)")
+QUEUE_DEPTH = Gauge("luna_queue_depth", "Items waiting in a queue or in flight")
+TTS_CHARACTERS = Counter("luna_tts_characters_total", "Characters synthesized by the TTS model")
+HTTP_SECONDS = Histogram("luna_http_request_duration_seconds", "HTTP request latency by route")
+
+# Per-request stage timings, set by request_timings() and filled by track_stage()
+_current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("luna_stage_timings", default=None)
+
+
+@contextmanager
+def request_timings():
+    """Collect the duration of every stage run inside this block into a dict"""
+    timings = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time a pipeline stage into the stage histogram, the current request's timings and its trace"""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+@contextmanager
+def collect_updates():
+    """
+    Record the metric updates and stage timings made inside this block.
+
+    For work done in another process (the scheduler's stage workers): the dict
+    this yields is filled in on exit and replayed in the server by apply_updates().
+    Only one block may run at a time in the process, as each stage worker runs
+    one stage at a time.
+    """
+    before = REGISTRY.snapshot()
+    updates = {}
+    with request_timings() as timings:
+        yield updates
+    updates["timings"] = timings
+    updates["metrics"] = REGISTRY.changes_since(before)
+
+
+def apply_updates(updates: Dict):
+    """Merge updates from collect_updates() into this process's metrics and the current request's timings"""
+    REGISTRY.merge(updates.get("metrics", {}))
+    timings = _current_timings.get()
+    if timings is not None:
+        for stage, elapsed in updates.get("timings", {}).items():
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+# Simulated model behaviour, overridable through the environment
+LATENCY = float(os.environ.get("MOCK_LLM_LATENCY", "0.2"))           # seconds before the first token
+TOKEN_DELAY = float(os.environ.get("MOCK_LLM_TOKEN_DELAY", "0.01"))  # seconds between streamed tokens
+SUMMARY_WORDS = int(os.environ.get("MOCK_LLM_SUMMARY_WORDS", "40"))
+
+router = APIRouter(prefix="/v2")
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "prompt_chars": 0}
+
+
+def _reply_for(prompt: str) -> str:
+    """Deterministic stand-in for a summary: the first words of the text after the instruction line"""
+    body = prompt.split("\n", 1)[-1]
+    words = body.split()[:SUMMARY_WORDS]
+    return "Summary: " + " ".join(words)
+
+
+def _track(delta: int, prompt: str = ""):
+    with _stats_lock:
+        if delta > 0:
+            _stats["requests"] += 1
+            _stats["prompt_chars"] += len(prompt)
+        _stats["in_flight"] += delta
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+
+
+@router.get("/health")
+def health():
+    return {"postgres": "ok", "redis": "ok", "models": "ok"}
+
+
+@router.get("/ping")
+def ping():
+    return {"message": "pong", "status": "ok"}
+
+
+@router.get("/models")
+def models():
+    return {"llm": ["Sarvam-m"]}
+
+
+@router.get("/stats")
+def stats():
+    """Request counters, so tests can assert on call counts and concurrency"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+@router.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    model = body.get("model", "Sarvam-m")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    reply = _reply_for(prompt)
+
+    _track(+1, prompt)
+    if not body.get("stream"):
+        try:
+            await asyncio.sleep(LATENCY)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": time.time(),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4,
+                          "total_tokens": (len(prompt) + len(reply)) // 4},
+            }
+        finally:
+            _track(-1)
+
+    async def events():
+        try:
+            await asyncio.sleep(LATENCY)
+            for i, token in enumerate(reply.split(" ")):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": time.time(),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token if i == 0 else " " + token},
+                                 "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(TOKEN_DELAY)
+            yield "data: [DONE]\n\n"
+        finally:
+            _track(-1)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Imagine LLM endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    options = parser.parse_args()
+    print(f"Mock LLM endpoint: http://{options.host}:{options.port}/v2")
+    uvicorn.run(app, host=options.host, port=options.port)
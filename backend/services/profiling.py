@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import re
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+# Client-supplied request ids end up in file names, so only accept a safe alphabet
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_request_id(candidate: Optional[str] = None) -> str:
+    """Use the client's request id when it is safe, otherwise generate one"""
+    if candidate and _REQUEST_ID_PATTERN.match(candidate):
+        return candidate
+    return uuid.uuid4().hex
+
+
+class Trace:
+    """Spans recorded for one request"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans = []
+        # Set when the request is profiled; spans tell it which threads are working for the request
+        self.profiler = None
+
+    def add(self, name: str, start: float, end: float):
+        # list.append is atomic, so stages running on worker threads can share one trace
+        self.spans.append({
+            "name": name,
+            "thread": threading.current_thread().name,
+            "start": round(start - self.started, 6),
+            "end": round(end - self.started, 6),
+        })
+
+    def to_dict(self) -> Dict:
+        return {"request_id": self.request_id, "spans": list(self.spans)}
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        if self.trace.profiler is not None:
+            self.trace.profiler.enter_thread()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter())
+        if self.trace.profiler is not None:
+            self.trace.profiler.exit_thread()
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("luna_trace", default=None)
+
+
+def span(name: str):
+    """Record a span in the current request's trace; a shared no-op when tracing is off"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def start_trace(request_id: str) -> Trace:
+    trace = Trace(request_id)
+    _current_trace.set(trace)
+    return trace
+
+
+class TraceStore:
+    """Keeps the most recent traces in memory for lookup by request id"""
+
+    def __init__(self, max_traces: int = 200):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            self._traces[trace.request_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(request_id)
+
+
+# Innermost frames of a thread that is blocked waiting rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures worker waiting for its next job
+}
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of one request's threads at a fixed interval.
+
+    A thread is sampled while it is inside one of the request's spans (every
+    track_stage is one), so other requests and background workers such as
+    presynthesis stay out of the profile. Time spent inside native code (ffmpeg subprocesses, CTranslate2, torch kernels)
+    is attributed to the Python frame that called into it, which is enough to tell
+    the stages apart. Stage workers started by the scheduler's "processes" mode are
+    separate processes and are not sampled.
+
+    Idle threads are skipped, and a sample that repeats the thread's previous stack
+    only adds its weight to it, so long runs stay small.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._frames = []
+        self._frame_index = {}
+        self._samples = {}
+        # Thread id -> number of the request's spans open on it
+        self._threads = {}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="luna-profiler", daemon=True)
+        self.started = None
+        self.ended = None
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = len(self._frames)
+            self._frame_index[key] = index
+            self._frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def enter_thread(self):
+        """Sample the calling thread until the matching exit_thread()"""
+        thread_id = threading.get_ident()
+        with self._threads_lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def exit_thread(self):
+        thread_id = threading.get_ident()
+        with self._threads_lock:
+            if self._threads.get(thread_id, 0) <= 1:
+                self._threads.pop(thread_id, None)
+            else:
+                self._threads[thread_id] -= 1
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight = now - last
+            last = now
+            with self._threads_lock:
+                threads = set(self._threads)
+            if not threads:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in threads:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                samples, weights = self._samples.setdefault(names.get(thread_id, str(thread_id)), ([], []))
+                if samples and samples[-1] == stack:
+                    weights[-1] += weight
+                else:
+                    samples.append(stack)
+                    weights.append(weight)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.ended = time.perf_counter()
+
+    def to_speedscope(self, name: str, trace: Optional[Trace] = None) -> Dict:
+        """Build a speedscope document: one sampled profile per thread, plus the spans if given"""
+        duration = (self.ended or time.perf_counter()) - self.started
+        profiles = [
+            {
+                "type": "sampled",
+                "name": f"{thread_name} (sampled)",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread_name, (samples, weights) in self._samples.items()
+        ]
+        frames = list(self._frames)
+
+        if trace is not None:
+            profiles.extend(_spans_to_evented(trace, frames, duration))
+
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "luna-backend",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def _spans_to_evented(trace: Trace, frames: List[Dict], duration: float) -> List[Dict]:
+    """Turn recorded spans into speedscope evented profiles, one per thread"""
+    by_thread = {}
+    for s in trace.spans:
+        by_thread.setdefault(s["thread"], []).append(s)
+
+    profiles = []
+    for thread_name, spans in by_thread.items():
+        events = []
+        for s in spans:
+            frame = len(frames)
+            frames.append({"name": f"span:{s['name']}"})
+            events.append({"type": "O", "frame": frame, "at": s["start"]})
+            events.append({"type": "C", "frame": frame, "at": s["end"]})
+        # At equal timestamps, close the finished span before opening the next one
+        events.sort(key=lambda e: (e["at"], e["type"] == "O"))
+        profiles.append({
+            "type": "evented",
+            "name": f"{thread_name} (spans)",
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": max(duration, max(s["end"] for s in spans)),
+            "events": events,
+        })
+    return profiles
+
+
+def save_profile(profiler: SamplingProfiler, trace: Trace, profile_dir: str) -> str:
+    """Write the speedscope profile for a request and return its path"""
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{trace.request_id}.speedscope.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profiler.to_speedscope(trace.request_id, trace), f)
+    logger.info(f"Saved profile for request {trace.request_id}: {path}")
+    return path
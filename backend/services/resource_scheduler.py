@@ -0,0 +1,206 @@
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import contextvars
+import multiprocessing
+import threading
+
+from services.metrics import collect_updates, apply_updates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stages that run side by side in process_video_analysis
+STAGES = ("transcribe", "diarize")
+
+
+@dataclass
+class StageAllocation:
+    """CPU share granted to one pipeline stage"""
+    stage: str
+    threads: int
+    cpus: List[int] = field(default_factory=list)
+    num_workers: int = 1
+
+
+def available_cpus() -> List[int]:
+    """CPU ids this process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_stage_process(cpus: List[int], threads: int, pin_cpus: bool):
+    """Initializer for stage worker processes: pin cores and cap thread pools"""
+    if pin_cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Could not pin stage process to CPUs {cpus}: {e}")
+
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _run_stage(fn: Callable, args: tuple, kwargs: Dict) -> Tuple[Any, Dict]:
+    """Run a stage in its worker process; the metrics and timings it recorded travel back with the result"""
+    with collect_updates() as updates:
+        result = fn(*args, **kwargs)
+    return result, updates
+
+
+class ResourceScheduler:
+    """Partitions CPU cores between Whisper and pyannote so they do not oversubscribe the host"""
+
+    def __init__(self, mode: str = "threads", transcribe_threads: int = 0, diarize_threads: int = 0,
+                 whisper_workers: int = 1, pin_cpus: bool = False):
+        if mode not in ("threads", "processes"):
+            raise ValueError(f"Unknown scheduler mode '{mode}'. Use 'threads' or 'processes'.")
+
+        self.mode = mode
+        self.pin_cpus = pin_cpus
+        self.cpus = available_cpus()
+        self.allocations = self._partition(transcribe_threads, diarize_threads, max(1, whisper_workers))
+        self._executors = {}
+        self._executors_lock = threading.Lock()
+
+        for allocation in self.allocations.values():
+            logger.info(f"[Scheduler] {allocation.stage}: {allocation.threads} threads on CPUs {allocation.cpus} ({self.mode})")
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ResourceScheduler":
+        """Build a scheduler from the settings in config.yaml"""
+        config = config or {}
+        return cls(
+            mode=config.get("scheduler_mode", "threads"),
+            transcribe_threads=config.get("transcribe_threads", 0),
+            diarize_threads=config.get("diarize_threads", 0),
+            whisper_workers=config.get("whisper_workers", 1),
+            pin_cpus=config.get("pin_cpus", False),
+        )
+
+    def _partition(self, transcribe_threads: int, diarize_threads: int, whisper_workers: int) -> Dict[str, StageAllocation]:
+        """Split the available cores between the stages; 0 means take an automatic share"""
+        total = len(self.cpus)
+
+        if transcribe_threads and diarize_threads:
+            pass
+        elif transcribe_threads:
+            diarize_threads = max(1, total - transcribe_threads)
+        elif diarize_threads:
+            transcribe_threads = max(1, total - diarize_threads)
+        else:
+            # Even split, the odd core goes to Whisper since it gates the response
+            transcribe_threads = max(1, (total + 1) // 2)
+            diarize_threads = max(1, total - transcribe_threads)
+
+        transcribe_cpus = self.cpus[:transcribe_threads]
+        diarize_cpus = self.cpus[transcribe_threads:transcribe_threads + diarize_threads]
+        if len(diarize_cpus) < diarize_threads:
+            # Not enough cores for disjoint sets, share the tail of the list
+            diarize_cpus = self.cpus[-diarize_threads:]
+
+        return {
+            "transcribe": StageAllocation("transcribe", transcribe_threads, transcribe_cpus, whisper_workers),
+            "diarize": StageAllocation("diarize", diarize_threads, diarize_cpus),
+        }
+
+    def allocation(self, stage: str) -> StageAllocation:
+        """Return the CPU share for a stage"""
+        return self.allocations[stage]
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary of the partition, suitable for logs and benchmark reports"""
+        return {
+            "mode": self.mode,
+            "pin_cpus": self.pin_cpus,
+            "cpus": len(self.cpus),
+            "stages": {
+                name: {"threads": a.threads, "cpus": a.cpus, "num_workers": a.num_workers}
+                for name, a in self.allocations.items()
+            },
+        }
+
+    def run_stages(self, stages: Dict[str, Tuple[Callable, tuple, Dict]]) -> Dict[str, Any]:
+        """
+        Run the given stages concurrently and return their results by name.
+
+        Each entry maps a stage name to (function, args, kwargs). In "threads" mode the
+        stages share this process and rely on their thread-count arguments; in "processes"
+        mode each stage gets its own worker process, optionally pinned to its cores.
+        """
+        if self.mode == "threads":
+            with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+                # Run each stage in a copy of the caller's context so per-request timings are kept
+                futures = {
+                    name: executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+                    for name, (fn, args, kwargs) in stages.items()
+                }
+                return {name: future.result() for name, future in futures.items()}
+
+        # Stage processes are kept alive so their models stay loaded between requests
+        futures = {
+            name: self._stage_executor(name).submit(_run_stage, fn, args, kwargs)
+            for name, (fn, args, kwargs) in stages.items()
+        }
+        results = {}
+        for name, future in futures.items():
+            results[name], updates = future.result()
+            apply_updates(updates)
+        return results
+
+    def submit(self, stage: str, fn: Callable, *args, **kwargs) -> Future:
+        """Start one stage in the background, e.g. diarization while the caller streams transcription"""
+        if self.mode == "threads":
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"stage-{stage}")
+            future = executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+            # The worker thread exits once the stage is done
+            executor.shutdown(wait=False)
+            return future
+
+        staged = self._stage_executor(stage).submit(_run_stage, fn, args, kwargs)
+        future = Future()
+        # Replayed in the caller's context, so the updates reach the request that submitted the stage
+        context = contextvars.copy_context()
+
+        def unpack(done: Future):
+            try:
+                result, updates = done.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            context.run(apply_updates, updates)
+            future.set_result(result)
+
+        staged.add_done_callback(unpack)
+        return future
+
+    def _stage_executor(self, stage: str) -> ProcessPoolExecutor:
+        # Locked so two first requests at once do not each spawn a worker for the stage
+        with self._executors_lock:
+            executor = self._executors.get(stage)
+            if executor is None:
+                allocation = self.allocations[stage]
+                # Spawn rather than fork: torch and CTranslate2 thread pools do not survive fork
+                executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_stage_process,
+                    initargs=(allocation.cpus, allocation.threads, self.pin_cpus),
+                )
+                self._executors[stage] = executor
+            return executor
+
+    def shutdown(self):
+        """Stop any stage worker processes"""
+        with self._executors_lock:
+            for executor in self._executors.values():
+                executor.shutdown()
+            self._executors = {}
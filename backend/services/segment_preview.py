@@ -0,0 +1,409 @@
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+import soundfile as sf
+import librosa
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from services.metrics import track_stage
+from services.tts_service import VoiceCloningTTSService, XTTS_MODEL_NAME
+from services.tts_pool import TTSReplicaPool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Length of the linear fades at each join of a preview, in seconds
+SPLICE_FADE = 0.01
+
+
+class RenderCache:
+    """
+    Synthesized segment clips on disk, keyed by voice and text.
+
+    The same text in the same voice always renders to the same clip, so a preview,
+    a repeated preview and a later full render can share one synthesis. Least
+    recently used clips are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        clips = [name for name in os.listdir(cache_dir) if name.endswith(".wav") and ".tmp" not in name]
+        clips.sort(key=lambda name: os.path.getmtime(os.path.join(cache_dir, name)))
+        self._entries = OrderedDict((name[:-4], os.path.join(cache_dir, name)) for name in clips)
+
+    @staticmethod
+    def key(voice_key: str, text: str) -> str:
+        return hashlib.sha1(f"{XTTS_MODEL_NAME}\0{voice_key}\0{text.strip()}".encode("utf-8")).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            path = self._entries.get(key)
+            if path is None:
+                return None
+            if not os.path.exists(path):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        os.utime(path)
+        return path
+
+    def temp_path(self, key: str) -> str:
+        """Where to synthesize a clip before put() moves it into the cache"""
+        return os.path.join(self.cache_dir, f"{key}.{threading.get_ident()}.tmp.wav")
+
+    def put(self, key: str, clip_path: str) -> str:
+        path = os.path.join(self.cache_dir, f"{key}.wav")
+        os.replace(clip_path, path)
+        with self._lock:
+            self._entries[key] = path
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                if os.path.exists(evicted):
+                    os.remove(evicted)
+        return path
+
+
+class SegmentPreviewService:
+    """
+    Synthesizes one edited segment at a time so an edit can be heard without a full render.
+
+    One xTTS service stays loaded for the life of the process and keeps each speaker's
+    conditioning latents, so a preview costs a single inference call, or nothing when
+    the clip is already in the render cache. Full renders go through the same service
+    and cache, so segments previewed or synthesized ahead of time are not synthesized again;
+    with a replica pool, the rest are synthesized in parallel before the timeline is built.
+    """
+
+    def __init__(self, transcript_store, voice_library=None, assets_dir: Optional[str] = None,
+                 context_seconds: float = 1.0, cache_entries: int = 256,
+                 replicas: Optional[TTSReplicaPool] = None):
+        if assets_dir is None:
+            assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assests")
+        self.transcript_store = transcript_store
+        self.voice_library = voice_library
+        self.assets_dir = assets_dir
+        self.context_seconds = context_seconds
+        self.cache = RenderCache(os.path.join(assets_dir, "render_cache"), cache_entries)
+        self.replicas = replicas
+        self._tts = None
+        self._speakers_stale = False
+        # Bumped by every analysis so replica processes know to reload their speakers
+        self._generation = 0
+        self._load_lock = threading.Lock()
+        # xTTS is not safe to call from several threads at once
+        self.synthesis_lock = threading.Lock()
+        # Previews and renders in progress; background work waits for them
+        self._foreground = 0
+        self._foreground_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict, transcript_store, voice_library=None,
+                    assets_dir: Optional[str] = None) -> "SegmentPreviewService":
+        config = config or {}
+        if assets_dir is None:
+            assets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assests")
+        return cls(
+            transcript_store,
+            voice_library,
+            assets_dir,
+            context_seconds=config.get("preview_context_seconds", 1.0),
+            cache_entries=config.get("render_cache_entries", 256),
+            replicas=TTSReplicaPool.from_config(config, assets_dir),
+        )
+
+    def tts(self) -> VoiceCloningTTSService:
+        """The warm TTS service, loaded on first use and refreshed after a new analysis"""
+        with self._load_lock:
+            if self._tts is None:
+                with track_stage("tts_load"):
+                    self._tts = VoiceCloningTTSService(self.assets_dir, self.voice_library)
+                self._tts.clip_source = self.clip_path
+                self._speakers_stale = False
+            elif self._speakers_stale:
+                with self.synthesis_lock:
+                    self._tts.reload_speakers()
+                self._speakers_stale = False
+            return self._tts
+
+    @contextmanager
+    def foreground(self) -> Iterator[None]:
+        """Mark a request someone is waiting on, so background synthesis stays out of its way"""
+        with self._foreground_lock:
+            self._foreground += 1
+        try:
+            yield
+        finally:
+            with self._foreground_lock:
+                self._foreground -= 1
+
+    @property
+    def busy(self) -> bool:
+        return self._foreground > 0
+
+    def invalidate_speakers(self):
+        """A new analysis replaced the speaker clips; reload them before the next synthesis"""
+        self._speakers_stale = True
+        self._generation += 1
+
+    def voice_key(self, speaker: str) -> str:
+        """Identity of the voice a speaker is cloned from, for cache keys"""
+        tts = self.tts()
+        voice = tts.speaker_voices.get(speaker)
+        if voice:
+            return f"voice:{voice['voice_id']}"
+        sample = tts.speaker_voice_samples.get(speaker)
+        if sample is None:
+            raise ValueError(f"Voice sample for speaker {speaker} not found. "
+                             f"Available speakers: {list(tts.speaker_voice_samples.keys())}")
+        # Session clips are rewritten by every analysis
+        stat = os.stat(sample)
+        return f"clip:{sample}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def synthesize(self, text: str, speaker: str,
+                   still_wanted: Optional[Callable[[], bool]] = None) -> Tuple[Optional[str], bool]:
+        """
+        Path of the clip for `text` in the speaker's voice, and whether it came from the cache.
+
+        `still_wanted` is asked once the synthesis lock is held, right before a clip
+        would be synthesized; when it says no, nothing is synthesized and the path is None.
+        """
+        key = self.cache.key(self.voice_key(speaker), text)
+        path = self.cache.get(key)
+        if path is not None:
+            return path, True
+        with self.synthesis_lock:
+            path = self.cache.get(key)
+            if path is not None:
+                return path, True
+            if still_wanted is not None and not still_wanted():
+                return None, False
+            clip_path = self._tts.generate_cloned_speech(text, speaker, self.cache.temp_path(key))
+            return self.cache.put(key, clip_path), False
+
+    def clip_path(self, text: str, speaker: str) -> str:
+        return self.synthesize(text, speaker)[0]
+
+    def render(self) -> str:
+        """The full edited audio; only segments missing from the render cache are synthesized"""
+        with self.foreground():
+            tts = self.tts()
+            if self.replicas is not None:
+                self._synthesize_missing(tts)
+            return tts.process_full_transcript_editing()
+
+    def _synthesize_missing(self, tts: VoiceCloningTTSService):
+        """Fill the cache with every clip the render needs, spread over the replica processes"""
+        edited_data, original_data = tts.load_transcript_data()
+        jobs = {}
+        for diff in tts.find_transcript_differences(original_data, edited_data):
+            key = self.cache.key(self.voice_key(diff["speaker"]), diff["edited_text"])
+            if key not in jobs and key not in self.cache:
+                jobs[key] = (diff["edited_text"], diff["speaker"], self.cache.temp_path(key))
+        if len(jobs) < 2:
+            # Not worth the round trip; the warm replica here handles it
+            return
+        with track_stage("tts_parallel_synthesis"):
+            paths = self.replicas.synthesize_many(list(jobs.values()), self._generation)
+        for key, path in zip(jobs, paths):
+            self.cache.put(key, path)
+
+    def shutdown(self):
+        if self.replicas is not None:
+            self.replicas.shutdown()
+
+    def segment(self, index: int) -> Dict[str, Any]:
+        """A segment as currently edited"""
+        transcript = self.transcript_store.index()
+        if not 0 <= index < len(transcript):
+            raise IndexError(f"Segment {index} out of range (0-{len(transcript) - 1})")
+        segment = transcript.columns.segment_dict(index)
+        segment.update(self.transcript_store.edits().get(index, {}))
+        return segment
+
+    def preview(self, index: int, text: Optional[str] = None, speaker: Optional[str] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """WAV bytes of one segment re-synthesized with `text`, between the original audio around it"""
+        with self.foreground(), track_stage("tts_preview"):
+            segment = self.segment(index)
+            text = (text if text is not None else segment.get("text", "")).strip()
+            if not text:
+                raise ValueError("Nothing to synthesize: the segment text is empty.")
+            speaker = speaker or segment.get("speaker", "SPEAKER_00")
+
+            clip_path, cached = self.synthesize(text, speaker)
+            audio, sample_rate = self._splice(clip_path, segment["start"], segment["end"])
+
+            buffer = io.BytesIO()
+            sf.write(buffer, audio, sample_rate, format="WAV")
+        return buffer.getvalue(), {"cached": cached, "speaker": speaker, "duration": len(audio) / sample_rate}
+
+    def _splice(self, clip_path: str, start: float, end: float) -> Tuple[np.ndarray, int]:
+        """The clip with up to `context_seconds` of original audio before and after it"""
+        original_path = self._tts.original_audio_path
+        info = sf.info(original_path)
+        sample_rate = info.samplerate
+        context = int(self.context_seconds * sample_rate)
+        start_frame = min(int(start * sample_rate), info.frames)
+        end_frame = min(int(end * sample_rate), info.frames)
+
+        # Only the context windows are read, not the whole recording
+        before, _ = sf.read(original_path, start=max(0, start_frame - context), stop=start_frame, dtype="float32")
+        after, _ = sf.read(original_path, start=end_frame, stop=min(info.frames, end_frame + context), dtype="float32")
+        clip, clip_rate = sf.read(clip_path, dtype="float32")
+        before, after, clip = (x.mean(axis=1) if x.ndim > 1 else x for x in (before, after, clip))
+        if clip_rate != sample_rate:
+            clip = librosa.resample(clip, orig_sr=clip_rate, target_sr=sample_rate)
+
+        fade = int(SPLICE_FADE * sample_rate)
+        _fade(before, fade, out=True)
+        _fade(clip, fade, out=False)
+        _fade(clip, fade, out=True)
+        _fade(after, fade, out=False)
+        return np.concatenate([before, clip, after]).astype(np.float32), sample_rate
+
+
+class PresynthesisWorker:
+    """
+    Synthesizes edited segments in the background so a render finds them in the cache.
+
+    Edits are debounced per segment: a segment is synthesized once it has gone
+    `debounce` seconds without another edit, and scheduling a newer version drops
+    the queued one. A single thread at lowered OS priority does the work, one clip at a
+    time, and waits while a preview or render is in progress. A version that was
+    superseded or cancelled while it waited for the synthesis lock is skipped, and
+    one that finds a preview or render started meanwhile goes back in the queue.
+    """
+
+    def __init__(self, previewer: SegmentPreviewService, debounce: float = 1.5):
+        self.previewer = previewer
+        self.debounce = debounce
+        # index -> (due time, text, speaker)
+        self._pending: Dict[int, Tuple[float, str, str]] = {}
+        # index -> version of the edit last scheduled or cancelled; jobs check theirs is still current
+        self._latest: Dict[int, int] = {}
+        self._version = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.completed = 0
+
+    @classmethod
+    def from_config(cls, config: Dict, previewer: SegmentPreviewService) -> Optional["PresynthesisWorker"]:
+        config = config or {}
+        if not config.get("presynthesis", True):
+            return None
+        return cls(previewer, debounce=config.get("presynthesis_debounce_seconds", 1.5))
+
+    def schedule(self, index: int, text: str, speaker: str):
+        """Synthesize this version of a segment unless a newer one arrives within the debounce window"""
+        with self._condition:
+            self._pending[index] = (time.monotonic() + self.debounce, text, speaker)
+            self._bump(index)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="presynthesis", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self, index: int):
+        with self._condition:
+            self._pending.pop(index, None)
+            self._bump(index)
+
+    def clear(self):
+        """Drop everything queued, e.g. when a new analysis replaces the transcript"""
+        with self._condition:
+            self._pending.clear()
+            self._latest.clear()
+
+    def _bump(self, index: int):
+        # Callers hold self._condition
+        self._version += 1
+        self._latest[index] = self._version
+
+    def _is_current(self, index: int, version: int) -> bool:
+        with self._condition:
+            return self._latest.get(index) == version
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify()
+
+    def _next(self) -> Optional[Tuple[int, str, str, int]]:
+        """Block until a segment is due and nothing in the foreground is running"""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                due = [(when, index) for index, (when, _, _) in self._pending.items() if when <= now]
+                if due and not self.previewer.busy:
+                    _, index = min(due)
+                    _, text, speaker = self._pending.pop(index)
+                    return index, text, speaker, self._latest[index]
+                if due:
+                    timeout = 0.1
+                elif self._pending:
+                    timeout = min(when for when, _, _ in self._pending.values()) - now
+                else:
+                    timeout = None
+                self._condition.wait(timeout)
+            return None
+
+    def _run(self):
+        try:
+            # Linux schedules threads individually, so this only lowers the worker thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            index, text, speaker, version = job
+
+            def still_wanted():
+                return self._is_current(index, version) and not self.previewer.busy
+
+            try:
+                with track_stage("tts_presynthesis"):
+                    path, cached = self.previewer.synthesize(text, speaker, still_wanted)
+                if path is None:
+                    with self._condition:
+                        if self._latest.get(index) == version and index not in self._pending:
+                            # Only the foreground got in the way; try again once it is done
+                            self._pending[index] = (time.monotonic(), text, speaker)
+                    continue
+                self.completed += 1
+                if not cached:
+                    logger.info(f"Pre-synthesized segment {index} for {speaker}")
+            except Exception as e:
+                logger.warning(f"Pre-synthesis of segment {index} failed: {e}")
+
+
+def _fade(audio: np.ndarray, length: int, out: bool):
+    """Linear fade in place at the start (or end, when `out`) so joins do not click"""
+    length = min(length, len(audio))
+    if length == 0:
+        return
+    ramp = np.linspace(0.0, 1.0, length, dtype=np.float32)
+    if out:
+        audio[-length:] *= ramp[::-1]
+    else:
+        audio[:length] *= ramp
@@ -4,6 +4,8 @@ import logging
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from pydub import AudioSegment
+from services.metrics import track_stage
+from services.columnar_transcript import load_transcript
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,8 +44,7 @@ class SpeakerSegmentationService:
             if not transcript_path:
                 transcript_path = os.path.join(self.transcripts_dir, "transcript.json")
             
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                transcript_data = json.load(f)
+            transcript_data = load_transcript(transcript_path)
             
             logger.info(f"Loaded transcript with {len(transcript_data.get('segments', []))} segments")
             return transcript_data
@@ -150,14 +151,21 @@ class SpeakerSegmentationService:
             logger.error(f"Error creating speaker audio files: {e}")
             raise
     
-    def process_speaker_segmentation(self, transcript_path: str = None) -> Dict[str, str]:
-        """Complete workflow to process speaker segmentation"""
+    def process_speaker_segmentation(self, transcript_path: str = None, skip_speakers=None) -> Dict[str, str]:
+        """Complete workflow to process speaker segmentation; speakers in skip_speakers get no reference clip"""
+        with track_stage("speaker_segmentation"):
+            return self._process_speaker_segmentation(transcript_path, skip_speakers)
+
+    def _process_speaker_segmentation(self, transcript_path: str = None, skip_speakers=None) -> Dict[str, str]:
         try:
             # Load transcript data
             transcript_data = self.load_transcript_data(transcript_path)
             
             # Extract speaker segments
             speaker_segments = self.extract_speaker_segments(transcript_data)
+            if skip_speakers:
+                # Known voices already have a reference clip in the voice library
+                speaker_segments = {k: v for k, v in speaker_segments.items() if k not in skip_speakers}
             
             # Create speaker audio files
             speaker_audio_paths = self.create_speaker_audio_files(speaker_segments)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _coverage(starts: np.ndarray, ends: np.ndarray) -> Tuple[float, float]:
+    """Sweep over turn boundaries; returns (time with >=1 speaker, time with >=2 speakers)"""
+    if len(starts) == 0:
+        return 0.0, 0.0
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([np.ones(len(starts)), -np.ones(len(ends))])
+    # Ends sort before starts at the same instant so touching turns do not count as overlap
+    order = np.lexsort((deltas, times))
+    times, active = times[order], np.cumsum(deltas[order])
+    spans = np.diff(times)
+    active = active[:-1]
+    return float(spans[active >= 1].sum()), float(spans[active >= 2].sum())
+
+
+def _turn_stats(codes: np.ndarray, starts: np.ndarray, ends: np.ndarray, num_speakers: int):
+    """Turn counts and longest monologue per speaker code, merging consecutive turns of one speaker"""
+    order = np.argsort(starts, kind="stable")
+    codes, starts, ends = codes[order], starts[order], ends[order]
+
+    run_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    run_codes = codes[run_starts]
+    run_lengths = np.maximum.reduceat(ends, run_starts) - starts[run_starts]
+
+    turns = np.bincount(run_codes, minlength=num_speakers)
+    longest = np.zeros(num_speakers)
+    np.maximum.at(longest, run_codes, run_lengths)
+    return turns, longest
+
+
+def generate_statistics(combined_data: List[Dict], diarize_df: pd.DataFrame,
+                        duration: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Generate statistics from the analysis results in one grouped pass.
+
+    Speakers are factorized to integer codes once; every per-speaker figure is then
+    a bincount or reduceat over the segment and diarization arrays.
+    """
+    try:
+        segments = []
+        for segment in combined_data:
+            if not isinstance(segment, dict):
+                print(f"Warning: Skipping non-dictionary segment: {segment}")
+                continue
+            segments.append(segment)
+
+        seg_speakers = [segment.get('speaker') or 'Unknown' for segment in segments]
+        seg_words = np.fromiter((len(segment.get('text', '').split()) for segment in segments),
+                                dtype=np.int64, count=len(segments))
+
+        has_turns = diarize_df is not None and not diarize_df.empty
+        dia_starts = diarize_df['start'].to_numpy(dtype=np.float64) if has_turns else np.empty(0)
+        dia_ends = diarize_df['end'].to_numpy(dtype=np.float64) if has_turns else np.empty(0)
+        dia_speakers = diarize_df['speaker'].tolist() if has_turns else []
+
+        # One code space for transcript and diarization speakers, in order of first appearance
+        codes, speakers = pd.factorize(pd.Series(seg_speakers + dia_speakers, dtype=object))
+        speakers = list(speakers)
+        seg_codes, dia_codes = codes[:len(seg_speakers)], codes[len(seg_speakers):]
+        num_speakers = len(speakers)
+
+        word_counts = np.bincount(seg_codes, weights=seg_words, minlength=num_speakers)
+        speaking_times = np.bincount(dia_codes, weights=dia_ends - dia_starts, minlength=num_speakers)
+        if has_turns:
+            turn_counts, longest = _turn_stats(dia_codes, dia_starts, dia_ends, num_speakers)
+        else:
+            turn_counts, longest = np.zeros(num_speakers, dtype=np.int64), np.zeros(num_speakers)
+        minutes = speaking_times / 60.0
+        wpm = np.divide(word_counts, minutes, out=np.zeros(num_speakers), where=minutes > 0)
+
+        speech_time, overlap_time = _coverage(dia_starts, dia_ends)
+        if duration is None:
+            seg_ends = [segment.get('end') or 0.0 for segment in segments]
+            duration = float(max([0.0] + seg_ends + dia_ends.tolist()))
+        silence_time = max(0.0, duration - speech_time)
+
+        # Only speakers named in the transcript are reported, as before
+        reported = sorted(set(seg_codes.tolist()))
+
+        def per_speaker(values, cast=float):
+            return {speakers[c]: cast(values[c]) for c in reported}
+
+        return {
+            "total_speakers": len(reported),
+            "total_words": int(seg_words.sum()),
+            "speaker_word_counts": per_speaker(word_counts, int),
+            "speaker_speaking_times": per_speaker(speaking_times),
+            "speakers_list": [speakers[c] for c in reported],
+            "speaker_turn_counts": per_speaker(turn_counts, int),
+            "speaker_words_per_minute": per_speaker(np.round(wpm, 1)),
+            "speaker_longest_monologue": per_speaker(longest),
+            "duration": round(float(duration), 3),
+            "speech_time": round(speech_time, 3),
+            "overlap_time": round(overlap_time, 3),
+            "silence_time": round(silence_time, 3),
+            "silence_ratio": round(silence_time / duration, 4) if duration > 0 else 0.0,
+        }
+
+    except Exception as e:
+        return {"error": f"Statistics generation failed: {str(e)}"}
@@ -0,0 +1,268 @@
+import re
+import math
+import zlib
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.metrics import track_stage
+from services.summary_cache import SummaryCache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A line that starts a new speaker turn, e.g. "SPEAKER_01: ..." or "Alice: ..."
+_TURN_PATTERN = re.compile(r"^\s*[\w .'-]{1,40}:\s")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+SINGLE_PROMPT = "Summarize the following text in {language}:\n{text}"
+MAP_PROMPT = (
+    "The following is one part of a longer conversation transcript. Summarize this part in {language}, "
+    "keeping who said what, decisions and action items:\n{text}"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one conversation, in order. "
+    "Combine them into a single coherent summary in {language}:\n{text}"
+)
+
+# A chunk may also end after any turn whose hash hits this modulus once it is half full.
+# Boundaries then depend on content rather than position, so an edit only changes the
+# chunks around it and the cached summaries of the others stay valid.
+_BOUNDARY_MODULUS = 4
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Cheap token estimate; close enough for budgeting without loading a tokenizer"""
+    return math.ceil(len(text) / chars_per_token)
+
+
+class HierarchicalSummarizer:
+    """Map-reduce summarizer that keeps every LLM call within a token budget"""
+
+    def __init__(self, chat_fn: Callable[[str], Awaitable[str]], max_chunk_tokens: int = 1500,
+                 max_concurrency: int = 4, chars_per_token: float = 4.0, max_levels: int = 4,
+                 stream_fn: Optional[Callable[[str], AsyncIterator[str]]] = None,
+                 cache: Optional[SummaryCache] = None, cache_namespace: str = "",
+                 window_seconds: Optional[float] = None):
+        self.chat_fn = chat_fn
+        self.stream_fn = stream_fn
+        self.cache = cache
+        self.cache_namespace = cache_namespace
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.chars_per_token = chars_per_token
+        self.max_levels = max_levels
+        # Default time window for structured segments (None = token budget only)
+        self.window_seconds = window_seconds
+
+    @classmethod
+    def from_config(cls, chat_fn: Callable[[str], Awaitable[str]], config: Dict,
+                    stream_fn: Optional[Callable[[str], AsyncIterator[str]]] = None,
+                    cache: Optional[SummaryCache] = None) -> "HierarchicalSummarizer":
+        config = config or {}
+        return cls(
+            chat_fn,
+            max_chunk_tokens=config.get("summary_chunk_tokens", 1500),
+            max_concurrency=config.get("summary_max_concurrency", 4),
+            stream_fn=stream_fn,
+            cache=cache,
+            cache_namespace=config.get("llm_model", "Sarvam-m"),
+            window_seconds=config.get("summary_window_seconds") or None,
+        )
+
+    def _tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+    def _split_oversized(self, text: str) -> List[str]:
+        """Break a single turn that exceeds the budget at sentence, then word, boundaries"""
+        pieces = []
+        current = ""
+        for sentence in _SENTENCE_PATTERN.split(text):
+            units = [sentence] if self._tokens(sentence) <= self.max_chunk_tokens else sentence.split()
+            for unit in units:
+                candidate = f"{current} {unit}".strip()
+                if current and self._tokens(candidate) > self.max_chunk_tokens:
+                    pieces.append(current)
+                    current = unit
+                else:
+                    current = candidate
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def split_turns(self, context: str) -> List[str]:
+        """Group the lines of a transcript into speaker turns"""
+        turns = []
+        for line in context.splitlines():
+            if not line.strip():
+                continue
+            if turns and not _TURN_PATTERN.match(line):
+                # Continuation of the previous speaker's turn
+                turns[-1] = f"{turns[-1]} {line.strip()}"
+            else:
+                turns.append(line.strip())
+        return turns
+
+    def pack(self, units: List[str]) -> List[str]:
+        """Greedily pack turns into chunks that fit the token budget, never splitting a turn that fits"""
+        chunks = []
+        current = []
+        current_tokens = 0
+        for unit in units:
+            for piece in ([unit] if self._tokens(unit) <= self.max_chunk_tokens else self._split_oversized(unit)):
+                piece_tokens = self._tokens(piece) + 1
+                if current and current_tokens + piece_tokens > self.max_chunk_tokens:
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+                if (current_tokens * 2 >= self.max_chunk_tokens
+                        and zlib.crc32(piece.encode("utf-8")) % _BOUNDARY_MODULUS == 0):
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def chunk_segments(self, segments: List[Dict], max_window_seconds: Optional[float] = None) -> List[str]:
+        """Chunk transcript segments by speaker turn and time window as well as by token budget"""
+        windows = [[]]
+        window_start = None
+        for segment in segments:
+            start = segment.get("start", 0.0)
+            if window_start is None:
+                window_start = start
+            if max_window_seconds and windows[-1] and start - window_start >= max_window_seconds:
+                windows.append([])
+                window_start = start
+            line = f"{segment.get('speaker', 'Unknown')}: {segment.get('text', '').strip()}"
+            if windows[-1] and windows[-1][-1].startswith(f"{segment.get('speaker', 'Unknown')}: "):
+                windows[-1][-1] = f"{windows[-1][-1]} {segment.get('text', '').strip()}"
+            else:
+                windows[-1].append(line)
+        chunks = []
+        for window in windows:
+            chunks.extend(self.pack(window))
+        return chunks
+
+    async def _chat(self, prompt: str, kind: str) -> str:
+        """LLM call through the cache; any prompt seen before costs nothing"""
+        if self.cache is None:
+            return await self.chat_fn(prompt)
+        key = SummaryCache.key(kind, self.cache_namespace, prompt)
+        cached = self.cache.get(key, kind=f"summary_{kind}")
+        if cached is not None:
+            return cached
+        result = await self.chat_fn(prompt)
+        self.cache.put(key, result)
+        return result
+
+    def _summary_key(self, context: str, language: str) -> str:
+        return SummaryCache.key("summary", self.cache_namespace, language, context)
+
+    async def _map(self, prompt_template: str, chunks: List[str], language: str) -> List[str]:
+        """Summarize chunks concurrently, at most max_concurrency at a time, keeping their order"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(chunk: str) -> str:
+            async with semaphore:
+                return await self._chat(prompt_template.format(language=language, text=chunk), "chunk")
+
+        return list(await asyncio.gather(*(run(chunk) for chunk in chunks)))
+
+    async def _reduce_to_prompt(self, summaries: List[str], language: str) -> str:
+        """Merge partial summaries level by level until they fit in one final prompt"""
+        for level in range(self.max_levels):
+            groups = self.pack([s.strip() for s in summaries if s and s.strip()])
+            if len(groups) <= 1:
+                return REDUCE_PROMPT.format(language=language, text=groups[0] if groups else "")
+            logger.info(f"Reduce level {level + 1}: {len(summaries)} summaries in {len(groups)} groups")
+            summaries = await self._map(REDUCE_PROMPT, groups, language)
+        # Summaries stopped shrinking, send whatever is left in one call
+        return REDUCE_PROMPT.format(language=language, text="\n".join(summaries))
+
+    async def _final_prompt(self, chunks: List[str], language: str) -> str:
+        """Run the map and intermediate reduce levels; return the prompt for the last call"""
+        if len(chunks) == 1:
+            return SINGLE_PROMPT.format(language=language, text=chunks[0])
+
+        with track_stage("summarize_map"):
+            summaries = await self._map(MAP_PROMPT, chunks, language)
+        logger.info(f"Summarized {len(chunks)} chunks")
+
+        with track_stage("summarize_reduce"):
+            return await self._reduce_to_prompt(summaries, language)
+
+    async def summarize_chunks(self, chunks: List[str], language: str = "English") -> str:
+        """Map the chunks to partial summaries, then reduce until one call covers everything"""
+        if not chunks:
+            return ""
+        prompt = await self._final_prompt(chunks, language)
+        with track_stage("summarize_final"):
+            return await self._chat(prompt, "final")
+
+    def plan(self, context: str = "", segments: Optional[List[Dict]] = None,
+             window_seconds: Optional[float] = None) -> Tuple[str, List[str]]:
+        """
+        Chunks for free-form text, or for transcript segments when given (split by
+        time window too). Returns them with the text the whole summary is cached under.
+        """
+        if not segments:
+            return context, self.pack(self.split_turns(context))
+        window_seconds = window_seconds or self.window_seconds
+        chunks = self.chunk_segments(segments, window_seconds)
+        return f"segments:{window_seconds}\n" + "\n\n".join(chunks), chunks
+
+    async def summarize(self, context: str = "", language: str = "English",
+                        segments: Optional[List[Dict]] = None, window_seconds: Optional[float] = None) -> str:
+        """Summarize free-form transcript text, or transcript segments, of any length"""
+        cache_text, chunks = self.plan(context, segments, window_seconds)
+        if self.cache is not None:
+            cached = self.cache.get(self._summary_key(cache_text, language))
+            if cached is not None:
+                return cached
+
+        summary = await self.summarize_chunks(chunks, language)
+        if self.cache is not None:
+            self.cache.put(self._summary_key(cache_text, language), summary)
+        return summary
+
+    async def stream(self, context: str = "", language: str = "English",
+                     segments: Optional[List[Dict]] = None, window_seconds: Optional[float] = None) -> AsyncIterator[Dict]:
+        """
+        Summarize and stream the final call token by token.
+
+        Yields {"type": "progress", ...} once the work is planned, then
+        {"type": "token", "text": ...} events and finally {"type": "done"}.
+        """
+        cache_text, chunks = self.plan(context, segments, window_seconds)
+        if self.cache is not None:
+            cached = self.cache.get(self._summary_key(cache_text, language))
+            if cached is not None:
+                yield {"type": "progress", "chunks": 0, "cached": True}
+                yield {"type": "token", "text": cached}
+                yield {"type": "done"}
+                return
+
+        yield {"type": "progress", "chunks": len(chunks), "cached": False}
+        if not chunks:
+            yield {"type": "done"}
+            return
+
+        prompt = await self._final_prompt(chunks, language)
+        with track_stage("summarize_final"):
+            if self.stream_fn is None:
+                summary = await self._chat(prompt, "final")
+                yield {"type": "token", "text": summary}
+            else:
+                tokens = []
+                async for token in self.stream_fn(prompt):
+                    tokens.append(token)
+                    yield {"type": "token", "text": token}
+                summary = "".join(tokens)
+                if self.cache is not None:
+                    self.cache.put(SummaryCache.key("final", self.cache_namespace, prompt), summary)
+
+        if self.cache is not None:
+            self.cache.put(self._summary_key(cache_text, language), summary)
+        yield {"type": "done"}
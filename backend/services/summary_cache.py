@@ -0,0 +1,94 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.metrics import CACHE_REQUESTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """LRU of LLM results in memory with a TTL, backed by SQLite so restarts keep it warm"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute("DELETE FROM summaries WHERE created < ?", (time.time() - ttl_seconds,))
+            self._db.commit()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "SummaryCache":
+        config = config or {}
+        return cls(
+            path=config.get("summary_cache_path", os.path.join("assests", "cache", "summaries.sqlite")),
+            max_entries=config.get("summary_cache_entries", 1024),
+            ttl_seconds=config.get("summary_cache_ttl_hours", 168) * 3600,
+        )
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """Stable key for any combination of inputs (text, language, model, prompt kind)"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl_seconds
+
+    def get(self, key: str, kind: str = "summary") -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._memory[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM summaries WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+
+            if entry is None:
+                CACHE_REQUESTS.inc(cache=kind, result="miss")
+                return None
+
+            self._memory.move_to_end(key)
+            CACHE_REQUESTS.inc(cache=kind, result="hit")
+            return entry[0]
+
+    def put(self, key: str, value: str):
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO summaries (key, value, created) VALUES (?, ?, ?)",
+                                 (key, entry[0], entry[1]))
+                self._db.commit()
+
+    def _remember(self, key: str, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
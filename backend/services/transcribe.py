@@ -10,7 +10,11 @@ from faster_whisper import WhisperModel
 from typing import Union
 from concurrent.futures import ThreadPoolExecutor
 import subprocess
+import threading
+import time
 import yaml
+from services.metrics import track_stage, AUDIO_SECONDS, CACHE_REQUESTS, MODEL_LOAD_SECONDS
+from services.vad import speech_regions, trim_to_regions, map_turns_back
 
 with open("config.yaml", "r") as f:
     config = yaml.safe_load(f)
@@ -21,23 +25,79 @@ SAMPLE_RATE = 16000
 OUTPUT_DIR = os.path.join(os.getcwd(), "assests/users_segements")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Models stay resident between requests, keyed by everything that affects how they were built
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+# pyannote pipelines are not safe to call from several threads at once
+_diarization_lock = threading.Lock()
+# Held while a diarization has torch's process-wide thread count changed
+_torch_threads_lock = threading.Lock()
+
+def _get_cached_model(key, name, loader):
+    with _model_cache_lock:
+        model = _model_cache.get(key)
+    if model is not None:
+        CACHE_REQUESTS.inc(cache=name, result="hit")
+        return model
+
+    CACHE_REQUESTS.inc(cache=name, result="miss")
+    start = time.perf_counter()
+    model = loader()
+    MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, model=name)
+    with _model_cache_lock:
+        return _model_cache.setdefault(key, model)
+
+def whisper_device():
+    device = config.get("device", "auto")
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+def get_whisper_model(model_size=None, cpu_threads=0, num_workers=1, compute_type=None):
+    # Defaults come from config.yaml, which `python -m services.autotune` can tune for this host
+    model_size = model_size or config.get("model_size", "small")
+    compute_type = compute_type or config.get("compute_type", "default")
+    # Callers running beside diarization pass their scheduler share; alone, Whisper gets the tuned count
+    cpu_threads = cpu_threads or config.get("whisper_threads", 0)
+    device = whisper_device()
+    key = ("whisper", model_size, device, compute_type, cpu_threads, num_workers)
+    return _get_cached_model(key, "whisper", lambda: WhisperModel(
+        model_size,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=num_workers
+    ))
+
+def get_diarization_pipeline():
+    key = ("pyannote", "pyannote/speaker-diarization-3.1")
+    return _get_cached_model(key, "diarization", lambda: Pipeline.from_pretrained(
+        "pyannote/speaker-diarization-3.1",
+        use_auth_token=HUGGINGFACE_TOKEN
+    ))
+
 def extract_audio_from_video(video_path, audio_out_path):
     cmd = [
         "ffmpeg", "-y", "-i", video_path,
         "-ar", str(SAMPLE_RATE), "-ac", "1",
         "-f", "wav", audio_out_path
     ]
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with track_stage("extract_audio"):
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     print(f"[Extract] Audio saved to {audio_out_path}")
 
-def transcribe(audio_file):
+def iter_transcribe(audio_file, cpu_threads=0, num_workers=1, beam_size=None):
+    """Load the model now and return a generator of transcript segments, decoded as they are consumed"""
     print("[Transcription] Loading model...")
-    model = WhisperModel("small", device="cuda" if torch.cuda.is_available() else "cpu")
+    with track_stage("load_whisper"):
+        model = get_whisper_model(cpu_threads=cpu_threads, num_workers=num_workers)
 
     print(f"[Transcription] Transcribing {audio_file}...")
-    segments, info = model.transcribe(audio_file, beam_size=5, word_timestamps=True)
+    segments, info = model.transcribe(audio_file, beam_size=beam_size or config.get("beam_size", 5),
+                                      word_timestamps=True)
+    return _segment_dicts(segments, info)
 
-    transcript_result = {"segments": []}
+def _segment_dicts(segments, info):
     for segment in segments:
         seg = {
             "start": segment.start,
@@ -52,40 +112,119 @@ def transcribe(audio_file):
                     "end": word.end,
                     "word": word.word
                 })
-        transcript_result["segments"].append(seg)
+        yield seg
 
+    AUDIO_SECONDS.inc(info.duration, stage="transcribe")
     print("[Transcription] Done.")
-    return transcript_result
 
-def diarize(audio_file):
+def transcribe(audio_file, cpu_threads=0, num_workers=1, beam_size=None):
+    segments = iter_transcribe(audio_file, cpu_threads, num_workers, beam_size)
+    with track_stage("transcribe"):
+        return {"segments": list(segments)}
+
+def diarization_options(overrides=None):
+    """Diarization settings from config.yaml, with per-request overrides where given"""
+    options = {
+        "mode": config.get("diarization_mode", "full"),
+        "num_speakers": config.get("num_speakers") or None,
+        "min_speakers": config.get("min_speakers") or None,
+        "max_speakers": config.get("max_speakers") or None,
+        "segmentation_step": config.get("diarization_segmentation_step") or None,
+        "embedding_batch_size": config.get("diarization_embedding_batch_size") or None,
+    }
+    options.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    if options["mode"] not in ("full", "fast"):
+        raise ValueError(f"Unknown diarization mode '{options['mode']}'. Use 'full' or 'fast'.")
+    return options
+
+# Settings of the pipeline as loaded, so a request without overrides gets them back
+_pipeline_defaults = {}
+
+def _configure_pipeline(pipeline, options):
+    if not hasattr(pipeline, "_segmentation"):
+        return
+    step, batch_size = _pipeline_defaults.setdefault(
+        id(pipeline), (pipeline._segmentation.step, pipeline.embedding_batch_size))
+    # segmentation_step is a fraction of the segmentation window, like pyannote's own parameter
+    if options.get("segmentation_step"):
+        step = options["segmentation_step"] * pipeline._segmentation.duration
+    pipeline._segmentation.step = step
+    pipeline.embedding_batch_size = options.get("embedding_batch_size") or batch_size
+
+def diarize(audio_file, num_threads=None, options=None):
+    options = diarization_options(options)
+    if not num_threads:
+        return _diarize(audio_file, options)
+
+    # torch defaults to every core, which starves Whisper running alongside. The setting is
+    # process-wide, so diarizations take turns and each puts back the count it found. In
+    # "threads" mode the cap also applies to xTTS while it lasts; "processes" mode keeps
+    # diarization in its own process instead.
+    with _torch_threads_lock:
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(num_threads)
+        try:
+            return _diarize(audio_file, options)
+        finally:
+            torch.set_num_threads(previous_threads)
+
+def _diarize(audio_file, options):
     print("[Diarization] Loading audio with librosa...")
-    audio, sr = librosa.load(audio_file, sr=SAMPLE_RATE)
+    with track_stage("load_audio"):
+        audio, sr = librosa.load(audio_file, sr=SAMPLE_RATE)
+
+    signal = audio
+    if options["mode"] == "fast":
+        # pyannote needs 16 kHz, so the saving comes from dropping silence, not from resampling
+        with track_stage("vad"):
+            regions = speech_regions(audio, SAMPLE_RATE)
+            signal = trim_to_regions(audio, regions)
+        print(f"[Diarization] Fast mode: {len(signal) / max(len(audio), 1):.0%} of the audio is speech")
+
     audio_data = {
-        "waveform": torch.from_numpy(audio).unsqueeze(0),
+        "waveform": torch.from_numpy(signal).unsqueeze(0),
         "sample_rate": SAMPLE_RATE
     }
+    speaker_hints = {key: options[key] for key in ("num_speakers", "min_speakers", "max_speakers") if options[key]}
 
     print("[Diarization] Loading diarization model...")
-    pipeline = Pipeline.from_pretrained(
-        "pyannote/speaker-diarization-3.1",
-        use_auth_token=HUGGINGFACE_TOKEN
-    )
+    with track_stage("load_diarization"):
+        pipeline = get_diarization_pipeline()
 
     print("[Diarization] Running diarization...")
-    diarization = pipeline(audio_data)
+    with track_stage("diarize"), _diarization_lock:
+        _configure_pipeline(pipeline, options)
+        # Speaker embeddings come back with the turns, ordered like diarization.labels()
+        diarization, embeddings = pipeline(audio_data, return_embeddings=True, **speaker_hints) if len(signal) else (None, None)
+    AUDIO_SECONDS.inc(len(audio) / SAMPLE_RATE, stage="diarize")
 
     segments = []
-    for turn, _, speaker in diarization.itertracks(yield_label=True):
-        segments.append({
-            "start": turn.start,
-            "end": turn.end,
-            "speaker": speaker
-        })
-
-    df = pd.DataFrame(segments)
+    if diarization is not None:
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            segments.append({
+                "start": turn.start,
+                "end": turn.end,
+                "speaker": speaker
+            })
+    if options["mode"] == "fast":
+        segments = map_turns_back(segments, regions, SAMPLE_RATE)
+
+    df = pd.DataFrame(segments, columns=["start", "end", "speaker"])
+    # Kept on the frame so every caller of diarize() keeps its (df, audio) shape
+    df.attrs["speaker_embeddings"] = {}
+    if diarization is not None and embeddings is not None:
+        df.attrs["speaker_embeddings"] = {
+            label: embedding.tolist()
+            for label, embedding in zip(diarization.labels(), embeddings)
+            if np.all(np.isfinite(embedding))
+        }
     return df, audio
 
 def assign_speakers(diarize_df, transcript_result, fill_nearest=False):
+    with track_stage("assign_speakers"):
+        return _assign_speakers(diarize_df, transcript_result, fill_nearest)
+
+def _assign_speakers(diarize_df, transcript_result, fill_nearest=False):
     # (Same as your code)
     for seg in transcript_result["segments"]:
         diarize_df["intersection"] = np.minimum(diarize_df["end"], seg["end"]) - np.maximum(diarize_df["start"], seg["start"])
@@ -108,9 +247,9 @@ def assign_speakers(diarize_df, transcript_result, fill_nearest=False):
                 word["speaker"] = speaker
     return transcript_result
 
-def save_to_json(result, filename):
+def save_to_json(result, filename, indent=2):
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2)
+        json.dump(result, f, indent=indent)
     print(f"[Save] Output saved to {filename}")
 
 def save_speaker_audio(diarize_df, audio, sr, min_duration_sec=180, max_duration_sec=300):
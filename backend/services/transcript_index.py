@@ -0,0 +1,216 @@
+import os
+import json
+import bisect
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from services.columnar_transcript import ColumnarTranscript, load_transcript_columns, save_transcript
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields a patch may change on a segment
+EDITABLE_FIELDS = ("text", "words", "speaker")
+
+
+class TranscriptIndex:
+    """Time-range and page lookups over a columnar transcript"""
+
+    def __init__(self, columns: ColumnarTranscript):
+        self.columns = columns
+        self._seg_starts = columns.seg_start.tolist()
+        # Running maximum of end times: everything before the bisect point has ended
+        # before the window opens, even when segments overlap.
+        self._seg_max_ends = np.maximum.accumulate(columns.seg_end).tolist() if len(columns) else []
+        self._word_starts = columns.word_start.tolist()
+        self._word_max_ends = np.maximum.accumulate(columns.word_end).tolist() if columns.num_words else []
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def segment_range(self, start: float, end: float) -> Tuple[int, int]:
+        """Index range [first, last) of the candidate segments overlapping [start, end)"""
+        first = bisect.bisect_right(self._seg_max_ends, start)
+        last = bisect.bisect_left(self._seg_starts, end, lo=first)
+        return first, last
+
+    def segment_indices(self, start: float, end: float) -> List[int]:
+        first, last = self.segment_range(start, end)
+        ends = self.columns.seg_end[first:last]
+        return [first + int(i) for i in np.nonzero(ends > start)[0]]
+
+    def word_indices(self, start: float, end: float) -> List[int]:
+        first = bisect.bisect_right(self._word_max_ends, start)
+        last = bisect.bisect_left(self._word_starts, end, lo=first)
+        ends = self.columns.word_end[first:last]
+        return [first + int(i) for i in np.nonzero(ends > start)[0]]
+
+
+class TranscriptStore:
+    """
+    The current transcript behind the editor endpoints.
+
+    The original transcript is read through its columnar copy and reloaded when
+    a new analysis replaces it. Edits are kept as per-segment overrides in a small
+    JSON file instead of as a full edited copy.
+    """
+
+    def __init__(self, transcripts_dir: str, rendered_paths: Tuple[str, ...] = ()):
+        self.transcript_path = os.path.join(transcripts_dir, "transcript.json")
+        self.edits_path = os.path.join(transcripts_dir, "transcript-edits.json")
+        self.edited_path = os.path.join(transcripts_dir, "transcript-edited.json")
+        # Output rendered from the edits elsewhere, discarded along with them
+        self.rendered_paths = tuple(rendered_paths)
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_mtime = None
+        self._edits = None
+
+    def _columns_mtime(self) -> Optional[float]:
+        meta = os.path.join(os.path.splitext(self.transcript_path)[0] + ".columns", "meta.json")
+        return os.path.getmtime(meta) if os.path.exists(meta) else None
+
+    def index(self) -> TranscriptIndex:
+        """The index for the latest transcript, rebuilt only when the transcript changed"""
+        with self._lock:
+            return self._current_index()
+
+    def _current_index(self) -> TranscriptIndex:
+        # Callers hold self._lock
+        mtime = self._columns_mtime()
+        if self._index is None or mtime != self._loaded_mtime:
+            columns = load_transcript_columns(self.transcript_path)
+            if columns is None:
+                if not os.path.exists(self.transcript_path):
+                    raise FileNotFoundError("No transcript available. Analyze a video first.")
+                with open(self.transcript_path, "r", encoding="utf-8") as f:
+                    columns = save_transcript(json.load(f), self.transcript_path)
+                mtime = self._columns_mtime()
+            self._index = TranscriptIndex(columns)
+            self._loaded_mtime = mtime
+        return self._index
+
+    def edits(self) -> Dict[int, Dict]:
+        with self._lock:
+            return self._current_edits()
+
+    def _current_edits(self) -> Dict[int, Dict]:
+        # Callers hold self._lock
+        if self._edits is None:
+            self._edits = {}
+            if os.path.exists(self.edits_path):
+                with open(self.edits_path, "r", encoding="utf-8") as f:
+                    self._edits = {int(k): v for k, v in json.load(f).items()}
+        return self._edits
+
+    def reset_edits(self):
+        """Forget the edits and everything made from them, e.g. when a new transcript replaces the old one"""
+        with self._lock:
+            self._edits = {}
+            for path in (self.edits_path, self.edited_path, *self.rendered_paths):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _segment(self, index: TranscriptIndex, i: int, edits: Dict[int, Dict], include_words: bool) -> Dict:
+        segment = index.columns.segment_dict(i)
+        override = edits.get(i)
+        if override:
+            segment.update(override)
+        if not include_words:
+            segment.pop("words", None)
+        segment["index"] = i
+        segment["edited"] = bool(override)
+        return segment
+
+    def segments_in_window(self, start: float, end: float, include_words: bool = True) -> List[Dict]:
+        index = self.index()
+        edits = self.edits()
+        return [self._segment(index, i, edits, include_words) for i in index.segment_indices(start, end)]
+
+    def segments_page(self, offset: int, limit: int, include_words: bool = True) -> List[Dict]:
+        index = self.index()
+        edits = self.edits()
+        last = min(len(index), offset + limit)
+        return [self._segment(index, i, edits, include_words) for i in range(max(0, offset), last)]
+
+    def words_in_window(self, start: float, end: float) -> List[Dict]:
+        index = self.index()
+        words = []
+        for i in index.word_indices(start, end):
+            word = index.columns.words_between(i, i + 1)[0]
+            word["index"] = i
+            words.append(word)
+        return words
+
+    def apply_edits(self, patches: List[Dict]) -> List[int]:
+        """Record per-segment overrides; an edit back to the original text clears the override"""
+        updated = []
+        with self._lock:
+            # Both read under the lock, so a new transcript cannot slip in between the check and the write
+            index = self._current_index()
+            # Work on a copy and swap it in at the end, so a rejected batch changes nothing
+            edits = dict(self._current_edits())
+            for patch in patches:
+                i = int(patch["index"])
+                if not 0 <= i < len(index):
+                    raise IndexError(f"Segment {i} out of range (0-{len(index) - 1})")
+            for patch in patches:
+                i = int(patch["index"])
+                override = dict(edits.get(i, {}))
+                override.update({k: patch[k] for k in EDITABLE_FIELDS if patch.get(k) is not None})
+
+                original = index.columns.segment_dict(i)
+                override = {k: v for k, v in override.items() if v != original.get(k)}
+                if override:
+                    edits[i] = override
+                else:
+                    edits.pop(i, None)
+                updated.append(i)
+
+            with open(self.edits_path, "w", encoding="utf-8") as f:
+                json.dump({str(k): v for k, v in edits.items()}, f)
+            self._edits = edits
+        logger.info(f"Applied {len(patches)} segment edits, {len(edits)} segments edited in total")
+        return updated
+
+    def replace_edits(self, segments: List[Dict]) -> List[int]:
+        """
+        Make the edits match a whole edited transcript, as the editor posts it.
+
+        Segments are matched by position, as the TTS service diffs them; the
+        indices of the segments left edited are returned.
+        """
+        with self._lock:
+            index = self._current_index()
+            edits = {}
+            for i, segment in enumerate(segments[:len(index)]):
+                original = index.columns.segment_dict(i)
+                override = {k: segment[k] for k in EDITABLE_FIELDS
+                            if segment.get(k) is not None and segment[k] != original.get(k)}
+                if override:
+                    edits[i] = override
+
+            with open(self.edits_path, "w", encoding="utf-8") as f:
+                json.dump({str(k): v for k, v in edits.items()}, f)
+            self._edits = edits
+        logger.info(f"Replaced the edits from a posted transcript, {len(edits)} segments edited")
+        return sorted(edits)
+
+    def materialize_edited(self) -> str:
+        """Write the full edited transcript the TTS service diffs against, and return its path"""
+        index = self.index()
+        edits = self.edits()
+        transcript = index.columns.to_dict()
+        for i, override in edits.items():
+            transcript["segments"][i].update(override)
+        content = json.dumps(transcript)
+        if os.path.exists(self.edited_path):
+            with open(self.edited_path, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    # Unchanged; keeping the file's age lets callers reuse the last render
+                    return self.edited_path
+        with open(self.edited_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return self.edited_path
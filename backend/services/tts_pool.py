@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from services.resource_scheduler import available_cpus, _init_stage_process
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Resident memory of one xTTS v2 replica on CPU, a conservative estimate
+REPLICA_MEMORY_GB = 2.5
+DEFAULT_REPLICA_THREADS = 4
+
+# The replica owned by a worker process, and the speaker generation it has loaded
+_replica = None
+_replica_generation = None
+
+
+def available_memory_bytes() -> Optional[int]:
+    """MemAvailable from /proc/meminfo, or None where it cannot be read"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def plan_replicas(workers: int = 1, threads: int = 0,
+                  replica_memory_gb: float = REPLICA_MEMORY_GB) -> Tuple[int, int]:
+    """
+    Number of replicas and torch threads per replica.
+
+    `workers` 0 means as many replicas as the cores allow at `threads` each
+    (default 4). Either way the count is capped so the replicas fit in the
+    memory currently available.
+    """
+    cpus = len(available_cpus())
+    if workers > 0:
+        replicas = workers
+        threads = threads or max(1, cpus // workers)
+    else:
+        threads = threads or min(DEFAULT_REPLICA_THREADS, cpus)
+        replicas = max(1, cpus // threads)
+
+    memory = available_memory_bytes()
+    if memory is not None:
+        fits = max(1, int(memory // (replica_memory_gb * 1024 ** 3)))
+        if fits < replicas:
+            logger.warning(f"Only {fits} TTS replicas fit in {memory / 1024 ** 3:.1f} GB of free memory "
+                           f"(asked for {replicas})")
+            replicas = fits
+    return replicas, threads
+
+
+def _init_replica(threads: int, assets_dir: str, config: Dict):
+    """Initializer for replica processes: cap thread pools and load xTTS once"""
+    global _replica
+    _init_stage_process([], threads, False)
+    from services.tts_service import VoiceCloningTTSService
+    from services.voice_library import VoiceLibrary
+    # Each replica opens the library itself, and only when the server has it switched on
+    _replica = VoiceCloningTTSService(assets_dir, VoiceLibrary.from_config(config, assets_dir))
+
+
+def _synthesize_in_replica(text: str, speaker: str, output_path: str, generation: int) -> Tuple[str, float]:
+    global _replica_generation
+    if generation != _replica_generation:
+        # A newer analysis wrote new speaker clips since this replica last looked
+        _replica.reload_speakers()
+        _replica_generation = generation
+    start = time.perf_counter()
+    _replica.generate_cloned_speech(text, speaker, output_path)
+    return output_path, time.perf_counter() - start
+
+
+class TTSReplicaPool:
+    """
+    xTTS model replicas in worker processes, for synthesizing many segments at once.
+
+    Each replica is a full VoiceCloningTTSService with its own torch thread pool.
+    Processes are spawned on first use and kept, so their models stay loaded
+    between renders.
+    """
+
+    def __init__(self, replicas: int, threads: int, assets_dir: str, config: Optional[Dict] = None):
+        self.replicas = replicas
+        self.threads = threads
+        self.assets_dir = assets_dir
+        self.config = config or {}
+        self._executor = None
+        logger.info(f"TTS replica pool: {replicas} replicas x {threads} threads")
+
+    @classmethod
+    def from_config(cls, config: Dict, assets_dir: str) -> Optional["TTSReplicaPool"]:
+        """A pool as configured, or None when a single replica is all that is wanted or fits"""
+        config = config or {}
+        replicas, threads = plan_replicas(
+            config.get("tts_workers", 1),
+            config.get("tts_worker_threads", 0),
+            config.get("tts_worker_memory_gb", REPLICA_MEMORY_GB),
+        )
+        if replicas <= 1:
+            return None
+        return cls(replicas, threads, assets_dir, config)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork: torch thread pools do not survive fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.replicas,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_replica,
+                initargs=(self.threads, self.assets_dir, self.config),
+            )
+        return self._executor
+
+    def synthesize_many(self, jobs: List[Tuple[str, str, str]], generation: int = 0) -> List[str]:
+        """
+        Synthesize (text, speaker, output_path) jobs across the replicas.
+
+        Longest texts are handed out first so one long segment does not start last
+        and hold up the whole batch; the paths come back in job order.
+        """
+        pool = self._pool()
+        order = sorted(range(len(jobs)), key=lambda i: len(jobs[i][0]), reverse=True)
+        futures = {i: pool.submit(_synthesize_in_replica, *jobs[i], generation) for i in order}
+
+        paths = []
+        busy_seconds = 0.0
+        for i in range(len(jobs)):
+            path, seconds = futures[i].result()
+            paths.append(path)
+            busy_seconds += seconds
+        logger.info(f"Synthesized {len(jobs)} segments on {self.replicas} replicas "
+                    f"({busy_seconds:.1f}s of synthesis)")
+        return paths
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
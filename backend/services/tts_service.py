@@ -4,20 +4,33 @@ import logging
 import numpy as np
 import torch
 import librosa
+import time
+import soundfile as sf
+import yaml
 from pydub import AudioSegment
 from typing import Dict, List, Optional, Tuple
 from TTS.api import TTS
+from services.metrics import track_stage, MODEL_LOAD_SECONDS, TTS_CHARACTERS
+from services.columnar_transcript import load_transcript
+from services.voice_library import VoiceLibrary, load_speaker_voices
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+XTTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+
 class VoiceCloningTTSService:
     """Voice cloning TTS service using xTTS for generating audio from edited transcripts"""
     
-    def __init__(self, assets_dir: str = None):
+    def __init__(self, assets_dir: str = None, voice_library: Optional[VoiceLibrary] = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.tts_model = None
         self.speaker_voice_samples = {}
+        # xTTS conditioning latents per speaker, computed at most once per voice
+        self.speaker_latents = {}
+        # Optional (text, speaker_id) -> clip path used by the timelines instead of synthesizing
+        # each difference themselves, e.g. a render cache filled ahead of time
+        self.clip_source = None
         
         # Set up paths - use absolute paths
         if assets_dir is None:
@@ -33,6 +46,10 @@ class VoiceCloningTTSService:
           # Also check the alternative speaker_audio location in backend root
         backend_dir = os.path.dirname(self.assets_dir)
         self.alt_speaker_audio_dir = os.path.join(backend_dir, "speaker_audio")
+
+        # None when the library is switched off; callers build it with VoiceLibrary.from_config
+        self.voice_library = voice_library
+        self.speaker_voices = load_speaker_voices(self.transcripts_dir) if voice_library else {}
         
         self._initialize_xtts_model()
         self._load_speaker_voice_samples()
@@ -41,7 +58,9 @@ class VoiceCloningTTSService:
         """Initialize xTTS model for voice cloning"""
         try:
             # Load xTTS v2 model for multilingual voice cloning
-            self.tts_model = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(self.device)
+            start = time.perf_counter()
+            self.tts_model = TTS(XTTS_MODEL_NAME).to(self.device)
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, model="xtts")
             logger.info("xTTS model loaded successfully on device: %s", self.device)
         except Exception as e:
             logger.error(f"Failed to load xTTS model: {e}")
@@ -66,12 +85,33 @@ class VoiceCloningTTSService:
                             logger.info(f"Loaded voice sample for {speaker_id}")
                     break  # Use the first directory that exists
             
+            # Speakers matched to the library use its reference clip; a clip left in
+            # speaker_audio under the same label may be from an earlier video
+            for speaker_id, voice in self.speaker_voices.items():
+                try:
+                    self.speaker_voice_samples[speaker_id] = self.voice_library.sample_path(voice["voice_id"])
+                    logger.info(f"Using library voice {voice['voice_id']} for {speaker_id}")
+                except KeyError:
+                    # Never clone from the stale clip instead
+                    self.speaker_voice_samples.pop(speaker_id, None)
+                    logger.warning(f"Library voice {voice['voice_id']} for {speaker_id} not found; speaker unavailable")
+
             if not self.speaker_voice_samples:
                 logger.warning(f"No speaker voice samples found in directories: {directories_to_check}")
                     
         except Exception as e:
             logger.error(f"Error loading speaker voice samples: {e}")
     
+    def reload_speakers(self):
+        """Pick up the speaker clips and library voices written by a newer analysis"""
+        if self.voice_library:
+            # Voices enrolled by another process since this one loaded the library
+            self.voice_library.reload()
+        self.speaker_voices = load_speaker_voices(self.transcripts_dir) if self.voice_library else {}
+        self.speaker_voice_samples = {}
+        self.speaker_latents = {}
+        self._load_speaker_voice_samples()
+
     def load_transcript_data(self, edited_transcript_path: str = None, original_transcript_path: str = None):
         """Load both edited and original transcript JSON files"""
         try:
@@ -84,8 +124,7 @@ class VoiceCloningTTSService:
             with open(edited_transcript_path, 'r', encoding='utf-8') as f:
                 edited_data = json.load(f)
             
-            with open(original_transcript_path, 'r', encoding='utf-8') as f:
-                original_data = json.load(f)
+            original_data = load_transcript(original_transcript_path)
             
             logger.info(f"Loaded transcripts: {len(edited_data.get('segments', []))} edited segments, {len(original_data.get('segments', []))} original segments")
             return edited_data, original_data
@@ -121,6 +160,33 @@ class VoiceCloningTTSService:
         logger.info(f"Found {len(differences)} transcript differences")
         return differences
     
+    def _xtts(self):
+        """The underlying Xtts model, when the loaded TTS exposes it"""
+        model = getattr(getattr(self.tts_model, "synthesizer", None), "tts_model", None)
+        return model if hasattr(model, "get_conditioning_latents") else None
+
+    def get_conditioning_latents(self, speaker_id: str) -> Optional[Dict]:
+        """xTTS latents for a speaker: cached in memory, loaded from the voice library, or computed once"""
+        if speaker_id in self.speaker_latents:
+            return self.speaker_latents[speaker_id]
+        xtts = self._xtts()
+        if xtts is None:
+            return None
+
+        voice = self.speaker_voices.get(speaker_id)
+        latents = None
+        if voice and self.voice_library:
+            latents = self.voice_library.load_latents(voice["voice_id"], XTTS_MODEL_NAME, self.device)
+        if latents is None:
+            with track_stage("tts_conditioning"):
+                gpt_cond_latent, speaker_embedding = xtts.get_conditioning_latents(
+                    audio_path=[self.speaker_voice_samples[speaker_id]])
+            latents = {"gpt_cond_latent": gpt_cond_latent, "speaker_embedding": speaker_embedding}
+            if voice and self.voice_library:
+                self.voice_library.save_latents(voice["voice_id"], XTTS_MODEL_NAME, latents)
+        self.speaker_latents[speaker_id] = latents
+        return latents
+
     def generate_cloned_speech(self, text: str, speaker_id: str, output_path: str = None) -> str:
         """Generate speech using xTTS voice cloning for specific speaker"""
         if self.tts_model is None:
@@ -135,13 +201,24 @@ class VoiceCloningTTSService:
             if not output_path:
                 output_path = f"generated_{speaker_id}_{hash(text) % 100000}.wav"
             
+            latents = self.get_conditioning_latents(speaker_id)
+
             # Generate speech with xTTS voice cloning
-            self.tts_model.tts_to_file(
-                text=text,
-                speaker_wav=speaker_sample_path,
-                file_path=output_path,
-                language="en"
-            )
+            with track_stage("tts_synthesis"):
+                if latents is not None:
+                    # Reusing the latents skips re-encoding the reference clip on every segment
+                    xtts = self._xtts()
+                    out = xtts.inference(text, "en", latents["gpt_cond_latent"], latents["speaker_embedding"])
+                    sample_rate = getattr(getattr(xtts.config, "audio", None), "output_sample_rate", 24000)
+                    sf.write(output_path, np.asarray(out["wav"], dtype=np.float32), sample_rate)
+                else:
+                    self.tts_model.tts_to_file(
+                        text=text,
+                        speaker_wav=speaker_sample_path,
+                        file_path=output_path,
+                        language="en"
+                    )
+            TTS_CHARACTERS.inc(len(text))
             
             logger.info(f"Generated cloned speech for {speaker_id}: {output_path}")
             return output_path
@@ -150,6 +227,11 @@ class VoiceCloningTTSService:
             logger.error(f"Error generating cloned speech for {speaker_id}: {e}")
             raise
     
+    def _cloned_clip(self, text: str, speaker_id: str, output_path: str) -> str:
+        if self.clip_source is not None:
+            return self.clip_source(text, speaker_id)
+        return self.generate_cloned_speech(text, speaker_id, output_path)
+
     def create_modified_audio_timeline(self, differences: List[Dict], output_dir: str = "tts_output") -> str:
         """Create complete audio timeline with cloned speech - simple overlay approach"""
         try:
@@ -176,7 +258,7 @@ class VoiceCloningTTSService:
                 logger.info(f"Edited text: '{edited_text}'")
                 
                 # Generate cloned speech for edited text
-                cloned_audio_path = self.generate_cloned_speech(
+                cloned_audio_path = self._cloned_clip(
                     edited_text, 
                     speaker_id, 
                     os.path.join(output_dir, f"cloned_{diff['segment_index']}_{speaker_id}.wav")
@@ -257,7 +339,7 @@ class VoiceCloningTTSService:
                 edited_text = diff["edited_text"]
                 speaker_id = diff["speaker"]
                 
-                cloned_audio_path = self.generate_cloned_speech(
+                cloned_audio_path = self._cloned_clip(
                     edited_text, 
                     speaker_id, 
                     os.path.join(output_dir, f"cloned_v2_{diff['segment_index']}_{speaker_id}.wav")
@@ -317,6 +399,12 @@ class VoiceCloningTTSService:
                                       original_transcript_path: str = None,
                                       output_dir: str = "tts_output") -> str:
         """Complete workflow to process transcript edits and generate final audio"""
+        with track_stage("tts_editing"):
+            return self._process_full_transcript_editing(edited_transcript_path, original_transcript_path, output_dir)
+
+    def _process_full_transcript_editing(self, edited_transcript_path: str = None,
+                                         original_transcript_path: str = None,
+                                         output_dir: str = "tts_output") -> str:
         try:
             # Load transcript data
             edited_data, original_data = self.load_transcript_data(edited_transcript_path, original_transcript_path)
@@ -350,7 +438,11 @@ def run_voice_cloning_service():
     """Main function to run the voice cloning TTS service"""
     try:
         # Initialize service
-        tts_service = VoiceCloningTTSService()
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with open(os.path.join(backend_dir, "config.yaml"), "r") as f:
+            config = yaml.safe_load(f)
+        tts_service = VoiceCloningTTSService(
+            voice_library=VoiceLibrary.from_config(config, os.path.join(backend_dir, "assests")))
         
         # Process transcript editing and generate final audio
         final_audio_path = tts_service.process_full_transcript_editing()
@@ -364,4 +456,5 @@ def run_voice_cloning_service():
         logger.error(f"Voice cloning service failed: {e}")
         raise
 
-run_voice_cloning_service()
+if __name__ == "__main__":
+    run_voice_cloning_service()
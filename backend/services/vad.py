@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Dict, List
+
+
+def speech_regions(audio: np.ndarray, sample_rate: int, frame_seconds: float = 0.03,
+                   min_silence: float = 0.5, padding: float = 0.2, floor_db: float = 10.0) -> np.ndarray:
+    """
+    Energy-based voice activity: (start, end) sample ranges that contain speech.
+
+    A frame is speech when its RMS is `floor_db` above the noise floor (the 10th
+    percentile frame). Gaps shorter than `min_silence` are bridged and each region
+    is padded so word onsets and tails survive.
+    """
+    frame = max(1, int(frame_seconds * sample_rate))
+    num_frames = len(audio) // frame
+    if num_frames == 0:
+        return np.array([[0, len(audio)]], dtype=np.int64) if len(audio) else np.empty((0, 2), dtype=np.int64)
+
+    frames = audio[:num_frames * frame].reshape(num_frames, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1)) + 1e-10
+    threshold = max(np.percentile(rms, 10) * 10 ** (floor_db / 20), 1e-4)
+    voiced = np.r_[False, rms > threshold, False]
+
+    changes = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    starts, ends = changes[0::2], changes[1::2]
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Bridge short pauses inside speech
+    keep = np.r_[True, (starts[1:] - ends[:-1]) * frame_seconds >= min_silence]
+    starts = starts[keep]
+    ends = np.r_[ends[np.flatnonzero(keep)[1:] - 1], ends[-1]]
+
+    pad = int(padding / frame_seconds)
+    regions = np.stack([np.maximum(starts - pad, 0), np.minimum(ends + pad, num_frames)], axis=1) * frame
+    # Padding must not make neighbouring regions overlap
+    regions[1:, 0] = np.maximum(regions[1:, 0], regions[:-1, 1])
+    return regions.astype(np.int64)
+
+
+def trim_to_regions(audio: np.ndarray, regions: np.ndarray) -> np.ndarray:
+    """Concatenate only the speech regions"""
+    if len(regions) == 0:
+        return audio[:0]
+    return np.concatenate([audio[start:end] for start, end in regions])
+
+
+def map_turns_back(turns: List[Dict], regions: np.ndarray, sample_rate: int) -> List[Dict]:
+    """
+    Convert turns timed on the trimmed signal back to original times.
+
+    A turn that spans a removed silence is split at it, since nobody spoke there.
+    """
+    if len(regions) == 0:
+        return []
+    lengths = (regions[:, 1] - regions[:, 0]) / sample_rate
+    trimmed_ends = np.cumsum(lengths)
+    trimmed_starts = trimmed_ends - lengths
+    original_starts = regions[:, 0] / sample_rate
+
+    mapped = []
+    for turn in turns:
+        first = int(np.searchsorted(trimmed_ends, turn["start"], side="right"))
+        last = int(np.searchsorted(trimmed_starts, turn["end"], side="left"))
+        for i in range(first, min(last, len(regions))):
+            start = max(turn["start"], trimmed_starts[i])
+            end = min(turn["end"], trimmed_ends[i])
+            if end <= start:
+                continue
+            offset = original_starts[i] - trimmed_starts[i]
+            mapped.append({**turn, "start": float(start + offset), "end": float(end + offset)})
+    return mapped
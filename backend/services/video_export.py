@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import subprocess
+from typing import Optional
+
+from services.metrics import track_stage
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIDEO_DIR = os.path.join(BACKEND_DIR, "assests", "video")
+EXPORT_DIR = os.path.join(BACKEND_DIR, "assests", "exports")
+_SOURCE_FILE = os.path.join(VIDEO_DIR, "source.json")
+
+# Audio is the only stream that is encoded; video is copied packet for packet
+AUDIO_CODECS = {
+    "aac": ["-c:a", "aac", "-b:a", "192k"],
+    "opus": ["-c:a", "libopus", "-b:a", "128k"],
+}
+KEEP_EXPORTS = 5
+
+
+def remember_source_video(video_path: str, keep_copy: bool) -> str:
+    """
+    Record the video the current transcript came from, for exports.
+
+    Uploads are temporary files, so they are moved into assests/video; videos
+    analyzed in place by path are only referenced.
+    """
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    if keep_copy:
+        extension = os.path.splitext(video_path)[1].lower() or ".mp4"
+        for name in os.listdir(VIDEO_DIR):
+            if name.startswith("source."):
+                os.remove(os.path.join(VIDEO_DIR, name))
+        stored = os.path.join(VIDEO_DIR, f"source{extension}")
+        shutil.move(video_path, stored)
+        video_path = stored
+    with open(_SOURCE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"path": os.path.abspath(video_path)}, f)
+    print(f"[Export] Source video: {video_path}")
+    return video_path
+
+
+def source_video_path() -> Optional[str]:
+    if not os.path.exists(_SOURCE_FILE):
+        return None
+    with open(_SOURCE_FILE, "r", encoding="utf-8") as f:
+        path = json.load(f)["path"]
+    return path if os.path.exists(path) else None
+
+
+def mux_audio(video_path: str, audio_path: str, output_path: str, audio_codec: str = "aac") -> str:
+    """Replace the audio track of a video, copying the video stream instead of re-encoding it"""
+    if audio_codec not in AUDIO_CODECS:
+        raise ValueError(f"Unsupported audio codec '{audio_codec}'. Use one of {list(AUDIO_CODECS)}.")
+    extension = os.path.splitext(output_path)[1].lower()
+    if audio_codec == "opus" and extension == ".avi":
+        raise ValueError("Opus audio cannot be stored in AVI; use aac.")
+
+    cmd = [
+        "ffmpeg", "-y", "-i", video_path, "-i", audio_path,
+        "-map", "0:v", "-map", "1:a:0",
+        "-c:v", "copy", *AUDIO_CODECS[audio_codec],
+    ]
+    if extension in (".mp4", ".mov"):
+        # Index at the front so players can start before the whole file has arrived
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(output_path)
+
+    with track_stage("export_mux"):
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to mux the edited audio: {result.stderr.decode(errors='ignore')[-500:]}")
+    print(f"[Export] Video saved to {output_path}")
+    return output_path
+
+
+def export_video(audio_path: str, audio_codec: str = "aac") -> str:
+    """Mux rendered audio into the source video; returns the export's file name"""
+    video_path = source_video_path()
+    if video_path is None:
+        raise FileNotFoundError("The source video is no longer available. Analyze the video again.")
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    extension = os.path.splitext(video_path)[1].lower() or ".mp4"
+    name = f"edited_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}{extension}"
+    mux_audio(video_path, audio_path, os.path.join(EXPORT_DIR, name), audio_codec)
+
+    exports = sorted(os.listdir(EXPORT_DIR), reverse=True)
+    for old in exports[KEEP_EXPORTS:]:
+        os.remove(os.path.join(EXPORT_DIR, old))
+    return name
+
+
+def export_path(name: str) -> Optional[str]:
+    """Path of an export by name, refusing anything that is not a plain file name in the export directory"""
+    if os.path.basename(name) != name or name.startswith("."):
+        return None
+    path = os.path.join(EXPORT_DIR, name)
+    return path if os.path.isfile(path) else None
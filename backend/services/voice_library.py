@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Session file mapping this video's diarization labels to library voices
+SPEAKER_VOICES_FILE = "speaker_voices.json"
+
+
+def _normalize(vector) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if not np.isfinite(norm) or norm == 0:
+        return None
+    return vector / norm
+
+
+class VoiceLibrary:
+    """
+    Known voices that persist across videos.
+
+    Each voice keeps a pyannote speaker embedding, the reference clip it was
+    enrolled with and, once computed, its xTTS conditioning latents. Embeddings
+    are L2-normalized rows of one matrix, so nearest-neighbour lookup is a single
+    matrix-vector product (cosine similarity).
+    """
+
+    def __init__(self, path: str, match_threshold: float = 0.7):
+        self.path = path
+        self.match_threshold = match_threshold
+        self.index_path = os.path.join(path, "index.json")
+        self.embeddings_path = os.path.join(path, "embeddings.npy")
+        self.samples_dir = os.path.join(path, "samples")
+        self.latents_dir = os.path.join(path, "latents")
+        self._lock = threading.Lock()
+
+        os.makedirs(self.samples_dir, exist_ok=True)
+        os.makedirs(self.latents_dir, exist_ok=True)
+        self._voices: List[Dict[str, Any]] = []
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._loaded_mtime = None
+        self.reload()
+        logger.info(f"Voice library at {path}: {len(self._voices)} known voices")
+
+    @classmethod
+    def from_config(cls, config: Dict, assets_dir: str) -> Optional["VoiceLibrary"]:
+        config = config or {}
+        if not config.get("voice_library", True):
+            return None
+        return cls(os.path.join(assets_dir, "voice_library"), match_threshold=config.get("voice_match_threshold", 0.7))
+
+    def reload(self):
+        """Re-read the library if another process (e.g. a TTS replica's parent) changed it"""
+        with self._lock:
+            if not (os.path.exists(self.index_path) and os.path.exists(self.embeddings_path)):
+                return
+            mtime = os.path.getmtime(self.index_path)
+            if mtime == self._loaded_mtime:
+                return
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._voices = json.load(f)["voices"]
+            self._embeddings = np.load(self.embeddings_path)
+            self._loaded_mtime = mtime
+
+    def __len__(self) -> int:
+        return len(self._voices)
+
+    def _save(self):
+        """Write the index and embedding matrix, each replaced atomically"""
+        tmp_index = f"{self.index_path}.tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump({"voices": self._voices}, f, indent=2)
+        tmp_embeddings = f"{self.embeddings_path}.tmp.npy"
+        np.save(tmp_embeddings, self._embeddings)
+        os.replace(tmp_embeddings, self.embeddings_path)
+        os.replace(tmp_index, self.index_path)
+        self._loaded_mtime = os.path.getmtime(self.index_path)
+
+    def _position(self, voice_id: str) -> int:
+        for i, voice in enumerate(self._voices):
+            if voice["id"] == voice_id:
+                return i
+        raise KeyError(f"Unknown voice {voice_id}")
+
+    def voices(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(voice) for voice in self._voices]
+
+    def voice(self, voice_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._voices[self._position(voice_id)])
+
+    def rename(self, voice_id: str, name: str) -> Dict[str, Any]:
+        with self._lock:
+            voice = self._voices[self._position(voice_id)]
+            voice["name"] = name
+            self._save()
+            return dict(voice)
+
+    # Matching
+
+    def match_speakers(self, embeddings: Dict[str, Any]) -> Dict[str, Tuple[str, float]]:
+        """
+        Map diarization labels to known voices above the threshold.
+
+        Assignment is one-to-one, best pair first, so two speakers in the same video
+        never resolve to the same voice.
+        """
+        labels = []
+        queries = []
+        for label, embedding in embeddings.items():
+            query = _normalize(embedding)
+            if query is not None:
+                labels.append(label)
+                queries.append(query)
+
+        with self._lock:
+            if not labels or not self._voices or self._embeddings.shape[1] != len(queries[0]):
+                return {}
+            similarities = np.stack(queries) @ self._embeddings.T
+            voice_ids = [voice["id"] for voice in self._voices]
+
+        matches = {}
+        for flat in np.argsort(similarities, axis=None)[::-1]:
+            row, col = np.unravel_index(flat, similarities.shape)
+            similarity = float(similarities[row, col])
+            if similarity < self.match_threshold:
+                break
+            if labels[row] in matches or voice_ids[col] in {m[0] for m in matches.values()}:
+                continue
+            matches[labels[row]] = (voice_ids[col], similarity)
+        for label, (voice_id, similarity) in matches.items():
+            logger.info(f"{label} matches known voice {voice_id} (similarity {similarity:.2f})")
+        return matches
+
+    # Enrollment
+
+    def enroll(self, embedding, sample_path: str, name: Optional[str] = None) -> Optional[str]:
+        """Add a new voice from its embedding and reference clip; returns its id"""
+        vector = _normalize(embedding)
+        if vector is None or not os.path.exists(sample_path):
+            return None
+        voice_id = uuid.uuid4().hex[:12]
+        stored_sample = os.path.join(self.samples_dir, f"{voice_id}.wav")
+        shutil.copyfile(sample_path, stored_sample)
+
+        with self._lock:
+            if len(self._voices) and self._embeddings.shape[1] != len(vector):
+                logger.warning("Embedding size changed; not enrolling into a library built with another model")
+                os.remove(stored_sample)
+                return None
+            now = time.time()
+            self._voices.append({
+                "id": voice_id,
+                "name": name or f"Voice {len(self._voices) + 1}",
+                "sample": os.path.basename(stored_sample),
+                "sessions": 1,
+                "created": now,
+                "updated": now,
+            })
+            rows = self._embeddings if len(self._embeddings) else np.empty((0, len(vector)), dtype=np.float32)
+            self._embeddings = np.vstack([rows, vector[None, :]])
+            self._save()
+        logger.info(f"Enrolled new voice {voice_id}")
+        return voice_id
+
+    def observe(self, voice_id: str, embedding):
+        """Fold another session's embedding into a known voice (running mean on the unit sphere)"""
+        vector = _normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            position = self._position(voice_id)
+            voice = self._voices[position]
+            sessions = voice.get("sessions", 1)
+            merged = _normalize(self._embeddings[position] * sessions + vector)
+            if merged is not None:
+                self._embeddings[position] = merged
+            voice["sessions"] = sessions + 1
+            voice["updated"] = time.time()
+            self._save()
+
+    def resolve_session(self, embeddings: Dict[str, Any], matches: Dict[str, Tuple[str, float]],
+                        clip_paths: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Record a finished analysis: matched speakers refine their voice, new speakers
+        with a reference clip are enrolled. Returns label -> voice info.
+        """
+        speakers = {}
+        for label, embedding in embeddings.items():
+            if label in matches:
+                voice_id, similarity = matches[label]
+                self.observe(voice_id, embedding)
+                known = True
+            elif label in clip_paths:
+                voice_id, similarity = self.enroll(embedding, clip_paths[label]), None
+                known = False
+            else:
+                continue
+            if voice_id:
+                speakers[label] = {
+                    "voice_id": voice_id,
+                    "name": self.voice(voice_id)["name"],
+                    "known": known,
+                    "similarity": round(similarity, 4) if similarity is not None else None,
+                }
+        return speakers
+
+    # Reference audio and xTTS conditioning
+
+    def sample_path(self, voice_id: str) -> str:
+        return os.path.join(self.samples_dir, self.voice(voice_id)["sample"])
+
+    def _latents_path(self, voice_id: str, model_name: str) -> str:
+        safe_model = "".join(c if c.isalnum() else "_" for c in model_name)
+        return os.path.join(self.latents_dir, f"{voice_id}.{safe_model}.pt")
+
+    def load_latents(self, voice_id: str, model_name: str, device: str = "cpu"):
+        """Saved latents for a voice, on `device` (the TTS model's), or None"""
+        path = self._latents_path(voice_id, model_name)
+        if not os.path.exists(path):
+            return None
+        import torch
+        return torch.load(path, map_location=device)
+
+    def save_latents(self, voice_id: str, model_name: str, latents):
+        import torch
+        path = self._latents_path(voice_id, model_name)
+        torch.save(latents, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+
+def save_speaker_voices(transcripts_dir: str, speakers: Dict[str, Dict[str, Any]]):
+    with open(os.path.join(transcripts_dir, SPEAKER_VOICES_FILE), "w", encoding="utf-8") as f:
+        json.dump(speakers, f, indent=2)
+
+
+def load_speaker_voices(transcripts_dir: str) -> Dict[str, Dict[str, Any]]:
+    path = os.path.join(transcripts_dir, SPEAKER_VOICES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)